@@ -229,7 +229,7 @@ const evaluate = async (req, res) => {
     // Step 4: Update each submission
     for (let i = 0; i < submissions.length; i++) {
       const submission = submissions[i];
-      const result = evaluationResults;
+      const result = evaluationResults[i] || [];
 
       // Calculate the average score for this submission
       const avgScore =
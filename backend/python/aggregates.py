@@ -0,0 +1,453 @@
+import os
+import re
+import json
+import math
+import time
+import hashlib
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+from config import AGGREGATES_DB_PATH
+
+PASS_SCORE = 2.5
+WORD_RE = re.compile(r'\b[a-z]{4,}\b')
+TOPIC_WORD_RE = re.compile(r'\b[a-z]{3,}\b')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    class_id TEXT NOT NULL,
+    submission_id TEXT NOT NULL,
+    ingested_at REAL NOT NULL,
+    PRIMARY KEY (class_id, submission_id)
+);
+CREATE TABLE IF NOT EXISTS answers (
+    class_id TEXT NOT NULL,
+    submission_id TEXT NOT NULL,
+    student TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    score REAL NOT NULL,
+    similarity REAL NOT NULL,
+    student_answer TEXT NOT NULL,
+    reference_answer TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS answers_by_class ON answers (class_id);
+CREATE TABLE IF NOT EXISTS stats (
+    class_id TEXT NOT NULL,
+    scope TEXT NOT NULL,
+    key TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    mean REAL NOT NULL,
+    m2 REAL NOT NULL,
+    min REAL NOT NULL,
+    max REAL NOT NULL,
+    passed INTEGER NOT NULL,
+    PRIMARY KEY (class_id, scope, key)
+);
+CREATE INDEX IF NOT EXISTS stats_by_mean ON stats (class_id, scope, mean);
+CREATE TABLE IF NOT EXISTS vocab (
+    class_id TEXT NOT NULL,
+    word TEXT NOT NULL,
+    student_count INTEGER NOT NULL,
+    reference_count INTEGER NOT NULL,
+    PRIMARY KEY (class_id, word)
+);
+"""
+
+# Stateless term vectors, so an answer's similarity never changes as the class grows
+similarity_vectorizer = HashingVectorizer(
+    n_features=2 ** 18, stop_words='english', alternate_sign=False, norm='l2'
+)
+
+
+class RunningStats:
+    """Count, mean, min, max, pass count and Welford's sum of squared deviations"""
+
+    __slots__ = ("count", "mean", "m2", "min", "max", "passed")
+
+    def __init__(self, count=0, mean=0.0, m2=0.0, min=math.inf, max=-math.inf, passed=0):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+        self.passed = passed
+
+    def add(self, value, passed=False):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.passed += bool(passed)
+
+    def merge(self, other):
+        """Combine with the stats of a disjoint batch (Chan et al.)"""
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.passed += other.passed
+        return self
+
+    @property
+    def std(self):
+        """Sample standard deviation, like pandas; NaN below two values"""
+        return math.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else math.nan
+
+    def row(self):
+        return (self.count, self.mean, self.m2, self.min, self.max, self.passed)
+
+
+def clean(value):
+    """The cleaning ClassPerformanceAnalyzer.create_dataframe applies to text columns"""
+    return str(value).replace('"', '').strip()
+
+
+def submission_id_of(submission):
+    """Explicit submission id, or a content hash so resent submissions are skipped"""
+    if submission.get("submission_id"):
+        return str(submission["submission_id"])
+    body = json.dumps([submission.get("student_name"), submission.get("results", [])], sort_keys=True)
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()[:32]
+
+
+def answer_rows(submission):
+    rows = []
+    for result in submission.get("results", []):
+        rows.append({
+            "student": clean(submission.get("student_name", "Unknown")),
+            "topic": clean(result.get("topic", "Unknown")),
+            # Reports read scores back from "x.xx/5" strings, i.e. rounded to 2 places
+            "score": float(f"{float(result.get('score', 0)):.2f}"),
+            "student_answer": clean(result.get("student_answer", "")),
+            "reference_answer": clean(result.get("reference_answer", ""))
+        })
+    if rows:
+        student = similarity_vectorizer.transform([r["student_answer"] for r in rows])
+        reference = similarity_vectorizer.transform([r["reference_answer"] for r in rows])
+        similarities = np.asarray(student.multiply(reference).sum(axis=1)).ravel()
+        for row, similarity in zip(rows, similarities):
+            row["similarity"] = float(similarity)
+    return rows
+
+
+def summarize(rows):
+    """Stats per (scope, key) and word counts of a batch of answer rows"""
+    stats = defaultdict(RunningStats)
+    student_words, reference_words = Counter(), Counter()
+    for row in rows:
+        passed = row["score"] >= PASS_SCORE
+        for scope, key in (("class", ""), ("student", row["student"]), ("topic", row["topic"])):
+            stats[(scope, key)].add(row["score"], passed)
+        stats[("similarity", "")].add(row["similarity"])
+        student_words.update(WORD_RE.findall(row["student_answer"].lower()))
+        reference_words.update(WORD_RE.findall(row["reference_answer"].lower()))
+    return stats, student_words, reference_words
+
+
+def topic_clusters(topics):
+    """KMeans groups of topic names, each weighted by its attempts"""
+    from sklearn.cluster import KMeans
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    names = list(topics)
+    counts = np.array([topics[name].count for name in names], dtype=float)
+    try:
+        vectors = TfidfVectorizer(stop_words='english', max_features=5000).fit_transform(names)
+        model = KMeans(n_clusters=min(5, len(names)), random_state=42)
+        labels = model.fit(vectors, sample_weight=counts).labels_
+    except Exception as e:
+        print(f"⚠️ Clustering error: {str(e)}")
+        return []
+
+    clusters = []
+    for cluster in sorted(set(labels)):
+        members = [name for name, label in zip(names, labels) if label == cluster]
+        terms = Counter()
+        for name in members:
+            for word in TOPIC_WORD_RE.findall(name.lower()):
+                terms[word] += topics[name].count
+        combined = RunningStats()
+        for name in members:
+            combined.merge(RunningStats(*(topics[name].row())))
+        clusters.append({
+            'Cluster': int(cluster),
+            'CommonTerms': [word for word, _ in terms.most_common(5)],
+            'AvgScore': combined.mean,
+            'Count': combined.count
+        })
+    return clusters
+
+
+class AggregateStore:
+    """Per-class running aggregates of graded answers in a SQLite file.
+
+    Submissions are folded into the aggregates once (resends are skipped by
+    submission id), and the raw answers are kept only so ``verify`` and
+    ``rebuild`` can recompute everything from scratch.
+    """
+
+    def __init__(self, path=AGGREGATES_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @staticmethod
+    def check_class_id(class_id):
+        if not class_id.replace("-", "").replace("_", "").isalnum():
+            raise ValueError(f"Invalid class id: {class_id}")
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _apply(self, class_id, stats, student_words, reference_words):
+        """Merge batch aggregates into the stored ones; call inside a transaction"""
+        for (scope, key), batch in stats.items():
+            row = self._conn.execute(
+                "SELECT count, mean, m2, min, max, passed FROM stats WHERE class_id = ? AND scope = ? AND key = ?",
+                (class_id, scope, key)
+            ).fetchone()
+            merged = RunningStats(*row).merge(batch) if row else batch
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stats (class_id, scope, key, count, mean, m2, min, max, passed) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (class_id, scope, key) + merged.row()
+            )
+        for word in student_words.keys() | reference_words.keys():
+            self._conn.execute(
+                "INSERT INTO vocab (class_id, word, student_count, reference_count) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (class_id, word) DO UPDATE SET "
+                "student_count = student_count + excluded.student_count, "
+                "reference_count = reference_count + excluded.reference_count",
+                (class_id, word, student_words[word], reference_words[word])
+            )
+
+    def ingest(self, class_id, submissions):
+        """Fold new submissions into the class aggregates; returns (ingested, skipped)"""
+        self.check_class_id(class_id)
+        keyed = {}
+        for submission in submissions:
+            keyed.setdefault(submission_id_of(submission), submission)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                known = set()
+                ids = list(keyed)
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    known.update(row[0] for row in self._conn.execute(
+                        f"SELECT submission_id FROM submissions WHERE class_id = ? "
+                        f"AND submission_id IN ({','.join('?' * len(chunk))})",
+                        [class_id] + chunk
+                    ))
+                rows = []
+                now = time.time()
+                for submission_id, submission in keyed.items():
+                    if submission_id in known:
+                        continue
+                    self._conn.execute(
+                        "INSERT INTO submissions (class_id, submission_id, ingested_at) VALUES (?, ?, ?)",
+                        (class_id, submission_id, now)
+                    )
+                    for row in answer_rows(submission):
+                        row["submission_id"] = submission_id
+                        rows.append(row)
+                self._conn.executemany(
+                    "INSERT INTO answers (class_id, submission_id, student, topic, score, similarity, "
+                    "student_answer, reference_answer) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(class_id, r["submission_id"], r["student"], r["topic"], r["score"], r["similarity"],
+                      r["student_answer"], r["reference_answer"]) for r in rows]
+                )
+                self._apply(class_id, *summarize(rows))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(keyed) - len(known), len(submissions) - len(keyed) + len(known)
+
+    def _stats(self, class_id, scope, order="", limit=None):
+        sql = "SELECT key, count, mean, m2, min, max, passed FROM stats WHERE class_id = ? AND scope = ?"
+        params = [class_id, scope]
+        if order:
+            sql += f" ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return {row["key"]: RunningStats(*tuple(row)[1:]) for row in self._query(sql, params)}
+
+    def analysis(self, class_id):
+        """The analysis dict ClassPerformanceAnalyzer.generate_html_report renders, or None.
+
+        Reads O(#students + #topics) aggregate rows; no answer is revisited.
+        Similarities are hashed term-vector cosines fixed at ingestion, and
+        topic clusters are fitted on distinct topics weighted by attempts.
+        """
+        self.check_class_id(class_id)
+        overall = self._stats(class_id, "class").get("")
+        if overall is None:
+            return None
+        students = self._query(
+            "SELECT COUNT(*) FROM stats WHERE class_id = ? AND scope = 'student'", (class_id,)
+        )[0][0]
+        top_students = self._stats(class_id, "student", "mean DESC, key", 10)
+        topics = self._stats(class_id, "topic")
+        ranked = sorted(topics.items(), key=lambda item: item[1].mean)
+        similarity = self._stats(class_id, "similarity")[""]
+        errors = self._query(
+            "SELECT word, student_count FROM vocab WHERE class_id = ? AND reference_count = 0 "
+            "AND student_count > 5 ORDER BY student_count DESC, word LIMIT 10",
+            (class_id,)
+        )
+
+        def topic_entry(stats):
+            return {'Average': stats.mean, 'Attempts': stats.count, 'Difficulty': stats.std}
+
+        return {
+            'overall': {
+                'Average': overall.mean,
+                'Max': overall.max,
+                'Min': overall.min,
+                'PassRate': overall.passed / overall.count * 100,
+                'TotalStudents': students,
+                'TotalAttempts': overall.count,
+                'StdDev': overall.std
+            },
+            'top_students': {
+                name: {'Average': s.mean, 'Highest': s.max, 'Attempts': s.count} for name, s in top_students.items()
+            },
+            'difficult_topics': {name: topic_entry(s) for name, s in ranked[:3]},
+            'easy_topics': {name: topic_entry(s) for name, s in reversed(ranked[-3:])},
+            'clusters': topic_clusters(topics),
+            'similarity_stats': {'Average': similarity.mean, 'Max': similarity.max, 'Min': similarity.min},
+            'common_errors': {row["word"]: row["student_count"] for row in errors}
+        }
+
+    def _answers(self, class_id):
+        return [dict(row) for row in self._query(
+            "SELECT student, topic, score, similarity, student_answer, reference_answer "
+            "FROM answers WHERE class_id = ?", (class_id,)
+        )]
+
+    def verify(self, class_id, tolerance=1e-9):
+        """Recompute the aggregates from the stored answers with pandas and list any differences"""
+        import pandas as pd
+
+        self.check_class_id(class_id)
+        df = pd.DataFrame(self._answers(class_id))
+        stored = {scope: self._stats(class_id, scope) for scope in ("class", "student", "topic", "similarity")}
+        mismatches = []
+
+        def compare(scope, key, expected):
+            actual = stored[scope].get(key)
+            if actual is None:
+                mismatches.append({"scope": scope, "key": key, "field": "missing"})
+                return
+            values = {"count": actual.count, "mean": actual.mean, "min": actual.min,
+                      "max": actual.max, "std": actual.std, "passed": actual.passed}
+            for field, value in expected.items():
+                both_nan = isinstance(value, float) and math.isnan(value) and math.isnan(values[field])
+                if not both_nan and not math.isclose(values[field], value, rel_tol=tolerance, abs_tol=tolerance):
+                    mismatches.append({"scope": scope, "key": key, "field": field,
+                                       "stored": values[field], "recomputed": value})
+
+        def expected(group):
+            return {"count": int(group.count()), "mean": float(group.mean()), "min": float(group.min()),
+                    "max": float(group.max()), "std": float(group.std()), "passed": int((group >= PASS_SCORE).sum())}
+
+        if not df.empty:
+            compare("class", "", expected(df["score"]))
+            for scope, column in (("student", "student"), ("topic", "topic")):
+                for key, group in df.groupby(column)["score"]:
+                    compare(scope, key, expected(group))
+                extra = set(stored[scope]) - set(df[column])
+                mismatches += [{"scope": scope, "key": key, "field": "unexpected"} for key in extra]
+            similarity = expected(df["similarity"])
+            similarity.pop("passed")
+            compare("similarity", "", similarity)
+
+            student_words = Counter(WORD_RE.findall(" ".join(df["student_answer"]).lower()))
+            reference_words = Counter(WORD_RE.findall(" ".join(df["reference_answer"]).lower()))
+        else:
+            student_words, reference_words = Counter(), Counter()
+        vocab = {row["word"]: (row["student_count"], row["reference_count"]) for row in self._query(
+            "SELECT word, student_count, reference_count FROM vocab WHERE class_id = ?", (class_id,)
+        )}
+        for word in vocab.keys() | student_words.keys() | reference_words.keys():
+            if vocab.get(word, (0, 0)) != (student_words[word], reference_words[word]):
+                mismatches.append({"scope": "vocab", "key": word, "field": "counts",
+                                   "stored": vocab.get(word), "recomputed": (student_words[word], reference_words[word])})
+
+        return {"class_id": class_id, "answers": len(df), "ok": not mismatches, "mismatches": mismatches[:100]}
+
+    def rebuild(self, class_id):
+        """Recompute every aggregate of a class from its stored answers"""
+        self.check_class_id(class_id)
+        rows = self._answers(class_id)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM stats WHERE class_id = ?", (class_id,))
+                self._conn.execute("DELETE FROM vocab WHERE class_id = ?", (class_id,))
+                self._apply(class_id, *summarize(rows))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def drop(self, class_id):
+        self.check_class_id(class_id)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table in ("submissions", "answers", "stats", "vocab"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE class_id = ?", (class_id,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_aggregate_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AggregateStore()
+    return _store
+
+# Picklable entry points for the worker pool; the store is resolved in the worker
+def ingest_submissions(class_id, submissions):
+    return get_aggregate_store().ingest(class_id, submissions)
+
+def class_analysis(class_id):
+    return get_aggregate_store().analysis(class_id)
+
+def verify_class(class_id):
+    return get_aggregate_store().verify(class_id)
+
+def rebuild_class(class_id):
+    return get_aggregate_store().rebuild(class_id)
+
+def drop_class(class_id):
+    return get_aggregate_store().drop(class_id)
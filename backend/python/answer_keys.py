@@ -0,0 +1,82 @@
+import os
+import json
+import hashlib
+import threading
+import numpy as np
+from config import ANSWER_KEY_DIR
+
+
+class AnswerKeyStore:
+    """Compiled answer keys persisted as .npz artifacts, addressed by key id"""
+
+    def __init__(self, root=ANSWER_KEY_DIR):
+        self.root = root
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key_id_for(reference_text, model_name):
+        """Content address of a key: the same text and model always map to one id"""
+        digest = hashlib.sha256(f"{model_name}\0{reference_text}".encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def _path(self, key_id):
+        if not key_id.isalnum():
+            raise ValueError(f"Invalid answer key id: {key_id}")
+        return os.path.join(self.root, f"{key_id}.npz")
+
+    def exists(self, key_id):
+        return key_id in self._loaded or os.path.exists(self._path(key_id))
+
+    def save(self, key_id, compiled, model_name):
+        meta = {
+            "model": model_name,
+            "answers": compiled["answers"],
+            "clean": compiled["clean"],
+            "keywords": [sorted(k) for k in compiled["keywords"]],
+            "topics": compiled["topics"]
+        }
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, embeddings=compiled["embeddings"], meta=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._loaded[key_id] = compiled
+
+    def load(self, key_id):
+        """Return the compiled key, or None when no artifact exists for the id"""
+        with self._lock:
+            if key_id in self._loaded:
+                return self._loaded[key_id]
+
+        path = self._path(key_id)
+        if not os.path.exists(path):
+            return None
+
+        with np.load(path, allow_pickle=False) as artifact:
+            meta = json.loads(str(artifact["meta"]))
+            compiled = {
+                "answers": meta["answers"],
+                "clean": meta["clean"],
+                "keywords": [set(k) for k in meta["keywords"]],
+                "topics": meta["topics"],
+                "embeddings": artifact["embeddings"]
+            }
+
+        with self._lock:
+            self._loaded[key_id] = compiled
+        return compiled
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_key_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = AnswerKeyStore()
+    return _store
@@ -0,0 +1,81 @@
+"""Synthetic answer keys and student answer scripts as PDFs.
+
+Scripts use the ``Q1. ... / Answer: ...`` layout the segmenter expects.
+Students paraphrase the key (dropping, swapping and adding words); a share
+of them copy another student's script with light edits, so plagiarism
+checks have something to find.
+"""
+import random
+from benchmarks.pdfgen import pdf_bytes
+
+TOPICS = [
+    "photosynthesis", "respiration", "osmosis", "enzymes", "genetics", "evolution", "ecosystems",
+    "newton", "momentum", "energy", "circuits", "magnetism", "optics", "thermodynamics",
+    "algorithms", "recursion", "databases", "networks", "compilers", "scheduling",
+    "inflation", "markets", "taxation", "trade", "revolution", "democracy", "empire", "industry"
+]
+WORDS = [
+    "process", "energy", "system", "structure", "function", "change", "rate", "cell", "force", "model",
+    "input", "output", "cycle", "balance", "pressure", "signal", "memory", "value", "growth", "cost",
+    "increases", "decreases", "converts", "transfers", "stores", "controls", "depends", "produces",
+    "because", "therefore", "however", "which", "when", "where", "during", "between", "through", "within",
+    "light", "water", "heat", "current", "data", "price", "power", "state", "layer", "chain"
+]
+LINE_WORDS = 11
+PAGE_LINES = 45
+
+
+def _wrap(words):
+    return [" ".join(words[i:i + LINE_WORDS]) for i in range(0, len(words), LINE_WORDS)]
+
+
+def _paginate(lines):
+    return [lines[i:i + PAGE_LINES] for i in range(0, len(lines), PAGE_LINES)] or [[]]
+
+
+def script_pdf(answers, questions):
+    """PDF bytes of a script with one question line and one answer per entry"""
+    lines = []
+    for number, (question, answer) in enumerate(zip(questions, answers), start=1):
+        lines.append(f"Q{number}. {question}")
+        answer_lines = _wrap(answer.split()) or [""]
+        lines.append(f"Answer: {answer_lines[0]}")
+        lines.extend(answer_lines[1:])
+    return pdf_bytes(_paginate(lines))
+
+
+def answer_key(questions, answer_words, rng):
+    """(question texts, reference answers)"""
+    topics = rng.sample(TOPICS, k=min(questions, len(TOPICS)))
+    topics += rng.choices(TOPICS, k=questions - len(topics))
+    prompts = [f"Explain {topic} with an example." for topic in topics]
+    answers = [
+        " ".join([topic] + rng.choices(WORDS + [topic] * 4, k=answer_words - 1)) for topic in topics
+    ]
+    return prompts, answers
+
+
+def paraphrase(answer, rng, drop=0.2, swap=0.1, extra=0.1):
+    words = [w for w in answer.split() if rng.random() >= drop]
+    for i in range(len(words)):
+        if rng.random() < swap:
+            words[i] = rng.choice(WORDS)
+    for _ in range(int(len(words) * extra)):
+        words.insert(rng.randint(0, len(words)), rng.choice(WORDS))
+    return " ".join(words)
+
+
+def cohort(students, questions=10, answer_words=60, copy_rate=0.1, seed=0):
+    """Files of one assignment: ``key.pdf`` and ``s0000.pdf``... ``s{students-1}.pdf``"""
+    rng = random.Random(seed)
+    prompts, reference = answer_key(questions, answer_words, rng)
+    files = {"key.pdf": script_pdf(reference, prompts)}
+    scripts = []
+    for _ in range(students):
+        if scripts and rng.random() < copy_rate:
+            answers = [paraphrase(a, rng, drop=0.02, swap=0.02, extra=0.0) for a in rng.choice(scripts)]
+        else:
+            answers = [paraphrase(a, rng) for a in reference]
+        scripts.append(answers)
+        files[f"s{len(scripts) - 1:04d}.pdf"] = script_pdf(answers, prompts)
+    return files
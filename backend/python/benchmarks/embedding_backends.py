@@ -0,0 +1,122 @@
+"""Compare embedding backends on a fixed set of graded answers.
+
+Run from backend/python:
+
+    python -m benchmarks.embedding_backends --backends torch onnx onnx-int8 --scripts 40
+
+Every backend grades the same generated cohort against the same answer key.
+Throughput is answers/sec of ``evaluate_many`` (best of ``--repeat``), and
+the similarity and score of every answer are compared with the first
+backend listed, which serves as the reference. Backends that cannot load
+(e.g. ONNX Runtime not installed) are reported with their error.
+"""
+import argparse
+import json
+import random
+import time
+import numpy as np
+from embedding_backends import BACKENDS
+from evaluation import EvaluationEngine
+
+FACTS = [
+    "Photosynthesis converts light energy into chemical energy stored in glucose inside the chloroplast.",
+    "Newton's second law states that force equals mass multiplied by acceleration.",
+    "A binary search halves the sorted search interval at every step and runs in logarithmic time.",
+    "The mitochondria produce ATP through cellular respiration using oxygen and glucose.",
+    "Supply and demand determine the equilibrium price where quantity supplied equals quantity demanded.",
+    "An operating system schedules processes and manages memory, files and devices.",
+    "Osmosis is the movement of water across a semipermeable membrane towards higher solute concentration.",
+    "The French Revolution began in 1789 and abolished the feudal privileges of the nobility.",
+    "TCP provides reliable ordered delivery using acknowledgements, sequence numbers and retransmission.",
+    "Ohm's law relates voltage, current and resistance in an electrical circuit.",
+]
+FILLER = ["basically", "I think", "in general", "as we studied", "mainly", "also", "for example", "so"]
+
+
+def answer_key():
+    return "\n".join(f"Q{n}. Explain topic {n}.\nAnswer: {fact}" for n, fact in enumerate(FACTS, start=1))
+
+
+def student_answer(fact, rng):
+    """A fact with dropped, shuffled and padded words, or an unrelated one"""
+    if rng.random() < 0.15:
+        return rng.choice(FACTS)
+    words = [w for w in fact.split() if rng.random() > 0.25]
+    if rng.random() < 0.3:
+        rng.shuffle(words)
+    words.insert(rng.randint(0, len(words)), rng.choice(FILLER))
+    return " ".join(words)
+
+
+def cohort(scripts, seed=0):
+    rng = random.Random(seed)
+    return [
+        "\n".join(f"Q{n}. Explain topic {n}.\nAns: {student_answer(fact, rng)}"
+                  for n, fact in enumerate(FACTS, start=1))
+        for _ in range(scripts)
+    ]
+
+
+def grade(engine, students, key, repeat):
+    compiled = engine.compile_key(key)
+    engine.evaluate_many(students[:1], compiled)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = engine.evaluate_many(students, compiled)
+        best = min(best, time.perf_counter() - start)
+    rows = [r for script in results for r in script]
+    return best, np.array([r["similarity"] for r in rows]), np.array([r["score"] for r in rows])
+
+
+def run(backends, scripts, repeat):
+    students = cohort(scripts)
+    key = answer_key()
+    report = {"scripts": scripts, "answers": scripts * len(FACTS), "reference": backends[0], "runs": []}
+    reference = None
+    for backend in backends:
+        try:
+            start = time.perf_counter()
+            engine = EvaluationEngine(backend=backend)
+            load_seconds = time.perf_counter() - start
+            seconds, similarity, score = grade(engine, students, key, repeat)
+        except Exception as e:
+            report["runs"].append({"backend": backend, "error": str(e)})
+            continue
+        run_report = {
+            "backend": backend,
+            "load_seconds": round(load_seconds, 3),
+            "seconds": round(seconds, 4),
+            "answers_per_second": round(len(score) / seconds, 1)
+        }
+        if reference is None:
+            reference = (similarity, score)
+        else:
+            run_report.update({
+                "similarity_mean_abs_diff": round(float(np.mean(np.abs(similarity - reference[0]))), 4),
+                "similarity_max_abs_diff": round(float(np.max(np.abs(similarity - reference[0]))), 4),
+                "score_mean_abs_diff": round(float(np.mean(np.abs(score - reference[1]))), 4),
+                "score_max_abs_diff": round(float(np.max(np.abs(score - reference[1]))), 4)
+            })
+        report["runs"].append(run_report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--scripts", type=int, default=40)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.backends, args.scripts, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Measure the size and cosine-score error of each embedding store codec.
+
+Run from backend/python:
+
+    python -m benchmarks.embedding_store --answers 2000 --codecs float32 float16 pca:128 rp:128
+
+Answers are embedded once with the evaluation model; each codec is then
+fitted on the first ``--fit`` vectors (as a store fits its first batch),
+and scored on pairs of all vectors. Every codec is also written through an
+EmbeddingStore to report bytes on disk and lookup time.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from benchmarks.embedding_backends import FACTS, student_answer
+from embedding_store import EmbeddingStore, compression_error, unit_rows
+from evaluation import EvaluationEngine, preprocess
+
+DEFAULT_CODECS = ["float32", "float16", "pca:256", "pca:128", "pca:64", "rp:256", "rp:128", "rp:64"]
+
+
+def answers(count, seed=0):
+    rng = random.Random(seed)
+    texts = {preprocess(student_answer(rng.choice(FACTS), rng)) for _ in range(count)}
+    return sorted(t for t in texts if t)
+
+
+def directory_bytes(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def store_round_trip(texts, vectors, spec, fit):
+    with tempfile.TemporaryDirectory() as root:
+        store = EmbeddingStore(root, spec, flush_rows=len(texts) + 1, fit_rows=fit)
+        store.put_many(texts[:fit], vectors[:fit])
+        store.put_many(texts[fit:], vectors[fit:])
+        store.flush()
+        start = time.perf_counter()
+        found, decoded = EmbeddingStore(root, spec).get_many(texts)
+        seconds = time.perf_counter() - start
+        return {
+            "disk_bytes": directory_bytes(os.path.join(root, "segments")),
+            "lookup_seconds": round(seconds, 4),
+            "all_found": bool(found.all())
+        }
+
+
+def run(count, codecs, fit, pairs):
+    texts = answers(count)
+    vectors = unit_rows(EvaluationEngine().encode(texts))
+    fit = min(fit, len(texts))
+    report = {"answers": len(texts), "width": vectors.shape[1], "fit": fit, "codecs": []}
+    for spec in codecs:
+        entry = compression_error(vectors, spec, pairs, fit)
+        entry.update(store_round_trip(texts, vectors, spec, fit))
+        report["codecs"].append(entry)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--answers", type=int, default=2000)
+    parser.add_argument("--codecs", nargs="+", default=DEFAULT_CODECS)
+    parser.add_argument("--fit", type=int, default=500, help="vectors the reduced codecs are fitted on")
+    parser.add_argument("--pairs", type=int, default=20000)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.answers, args.codecs, args.fit, args.pairs)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
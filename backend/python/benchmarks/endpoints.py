@@ -0,0 +1,254 @@
+"""Stage timings of /checkPlagiarism, /evaluate and /generatePerformanceReport.
+
+Run from backend/python:
+
+    python -m benchmarks.endpoints --students 10 50 200 --questions 10 --output run.json
+    python -m benchmarks.endpoints --students 10 50 200 --baseline run.json
+
+A generated cohort (see benchmarks/answer_scripts.py) is served from a
+local HTTP stub and each endpoint is called over HTTP, once against cold
+caches and ``--repeat`` times warm. Stage timings come from those same
+requests: stages the service already instruments (download, extract,
+vectorize, encode, similarity, report render) are read from the /metrics
+histograms of the endpoint, and the rest (preprocess, segment, feedback,
+dataframe, analyze) are timed by wrapping the functions the endpoint
+calls. Stage seconds are summed over documents and worker threads, so a
+concurrent stage can exceed the endpoint's wall time.
+
+With ``--baseline`` every stage or endpoint slower than the baseline run by
+more than ``--tolerance`` is listed under "regressions".
+"""
+import argparse
+import functools
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+
+def histogram_stages():
+    from metrics import (
+        DOWNLOAD_SECONDS, PDF_PAGE_SECONDS, TFIDF_FIT_SECONDS, ENCODE_BATCH_SECONDS,
+        SIMILARITY_SECONDS, REPORT_RENDER_SECONDS
+    )
+    return {
+        "download": DOWNLOAD_SECONDS,
+        "extract": PDF_PAGE_SECONDS,
+        "vectorize": TFIDF_FIT_SECONDS,
+        "encode": ENCODE_BATCH_SECONDS,
+        "similarity": SIMILARITY_SECONDS,
+        "render": REPORT_RENDER_SECONDS
+    }
+
+
+def wrapped_stages(path):
+    """(stage, owner, attribute) of the uninstrumented functions an endpoint calls"""
+    import evaluation
+    import server
+
+    return {
+        "/checkPlagiarism": [("preprocess", server, "preprocess_text")],
+        "/evaluate": [
+            ("segment", evaluation, "segment"),
+            ("preprocess", evaluation, "answer_features"),
+            ("feedback", evaluation, "generate_detailed_feedback")
+        ],
+        "/generatePerformanceReport": [
+            ("dataframe", server.ClassPerformanceAnalyzer, "create_dataframe"),
+            ("analyze", server.ClassPerformanceAnalyzer, "analyze_class_performance")
+        ]
+    }[path]
+
+
+def histogram_sum(metric, endpoint):
+    """Seconds a histogram has recorded for one endpoint label, over all other labels"""
+    return sum(
+        value for name, key, _, value in metric.samples()
+        if name == f"{metric.name}_sum" and key[0] == endpoint
+    )
+
+
+@contextmanager
+def timing(stages, lock, name, owner, attr):
+    """Add the time spent in ``owner.attr`` to ``stages[name]`` while the block runs"""
+    original = getattr(owner, attr)
+
+    @functools.wraps(original)
+    def timed(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original(*args, **kwargs)
+        finally:
+            with lock:
+                stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+    setattr(owner, attr, timed)
+    try:
+        yield
+    finally:
+        setattr(owner, attr, original)
+
+
+def measured_request(client, path, body):
+    """(seconds, stage seconds, response) of one request through the real code path"""
+    histograms = histogram_stages()
+    before = {name: histogram_sum(metric, path) for name, metric in histograms.items()}
+    stages, lock = {}, threading.Lock()
+    with ExitStack() as stack:
+        for name, owner, attr in wrapped_stages(path):
+            stack.enter_context(timing(stages, lock, name, owner, attr))
+        start = time.perf_counter()
+        response = client.post(path, json=body)
+        seconds = time.perf_counter() - start
+    if response.status_code != 200:
+        raise RuntimeError(f"{path} returned {response.status_code}: {response.text[:200]}")
+    for name, metric in histograms.items():
+        spent = histogram_sum(metric, path) - before[name]
+        if spent > 0:
+            stages[name] = spent
+    return seconds, stages, response
+
+
+def best_of(runs):
+    names = {name for run in runs for name in run}
+    return {name: round(min(run.get(name, 0.0) for run in runs), 5) for name in sorted(names)}
+
+
+def timed_endpoint(client, path, body, repeat):
+    """Cold and best-warm timings of an endpoint with their stages, and the last response"""
+    runs = [measured_request(client, path, body) for _ in range(repeat + 1)]
+    (cold, cold_stages, _), warm = runs[0], runs[1:]
+    return {
+        "stages_cold": best_of([cold_stages]),
+        "stages_warm": best_of([stages for _, stages, _ in warm]) if warm else None,
+        "endpoint_cold_seconds": round(cold, 5),
+        "endpoint_warm_seconds": round(min(seconds for seconds, _, _ in warm), 5) if warm else None
+    }, runs[-1][2]
+
+
+def submissions_of(urls, results):
+    return [
+        {
+            "student_name": url.rsplit("/", 1)[-1],
+            "results": [
+                {k: r[k] for k in ("score", "topic", "student_answer", "reference_answer")} for r in graded
+            ]
+        }
+        for url, graded in zip(urls, results)
+    ]
+
+
+def run_cohort(client, students, questions, answer_words, repeat, delay):
+    from benchmarks.answer_scripts import cohort
+    from benchmarks.stub_server import serve
+
+    files = cohort(students, questions, answer_words, seed=students)
+    server, base = serve(files, delay)
+    try:
+        urls = [f"{base}/{name}" for name in sorted(files) if name != "key.pdf"]
+        key_url = f"{base}/key.pdf"
+        entry = {"students": students, "pdf_bytes": sum(len(f) for f in files.values())}
+
+        entry["checkPlagiarism"], _ = timed_endpoint(client, "/checkPlagiarism", {"file_urls": urls}, repeat)
+        entry["evaluate"], response = timed_endpoint(
+            client, "/evaluate", {"file_urls": urls, "answer_key": key_url}, repeat
+        )
+        submissions = submissions_of(urls, response.json()["results"])
+        entry["generatePerformanceReport"], _ = timed_endpoint(
+            client, "/generatePerformanceReport", {"submissions": submissions}, repeat
+        )
+        return entry
+    finally:
+        server.shutdown()
+
+
+def regressions(report, baseline, tolerance):
+    """Timings slower than the baseline's by more than ``tolerance`` (a fraction)"""
+    found = []
+    previous = {run["students"]: run for run in baseline["runs"]}
+    for run in report["runs"]:
+        before = previous.get(run["students"])
+        if before is None:
+            continue
+        for endpoint in ("checkPlagiarism", "evaluate", "generatePerformanceReport"):
+            now, then = run[endpoint], before.get(endpoint, {})
+            timings = [
+                (f"{group}.{name}", value, (then.get(group) or {}).get(name))
+                for group in ("stages_cold", "stages_warm")
+                for name, value in (now[group] or {}).items()
+            ]
+            timings += [(name, now[name], then.get(name)) for name in ("endpoint_cold_seconds", "endpoint_warm_seconds")]
+            for name, value, old in timings:
+                if value is not None and old and value > old * (1 + tolerance):
+                    found.append({
+                        "students": run["students"],
+                        "endpoint": endpoint,
+                        "timing": name,
+                        "baseline_seconds": old,
+                        "seconds": value,
+                        "ratio": round(value / old, 2)
+                    })
+    return found
+
+
+def run(student_counts, questions, answer_words, repeat, delay):
+    from fastapi.testclient import TestClient
+    import server
+
+    report = {
+        "config": {
+            "students": student_counts,
+            "questions": questions,
+            "answer_words": answer_words,
+            "repeat": repeat,
+            "delay": delay
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "runs": []
+    }
+    with TestClient(server.app) as client:
+        for students in student_counts:
+            report["runs"].append(run_cohort(client, students, questions, answer_words, repeat, delay))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--answer-words", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--delay", type=float, default=0.0, help="seconds the stub waits before each response")
+    parser.add_argument("--data-dir", help="service state directory (default: a fresh temporary one)")
+    parser.add_argument("--baseline", help="earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    # Caches and indexes must start empty; config reads this on import
+    with tempfile.TemporaryDirectory() as data_dir:
+        os.environ["SMARTCHECK_DATA_DIR"] = args.data_dir or data_dir
+        report = run(args.students, args.questions, args.answer_words, args.repeat, args.delay)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["regressions"] = regressions(report, json.load(f), args.tolerance)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
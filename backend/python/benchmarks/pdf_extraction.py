@@ -0,0 +1,63 @@
+"""Compare PDF extraction backends, serial and page-parallel, on a generated corpus.
+
+Run from backend/python:
+
+    python -m benchmarks.pdf_extraction --pages 1 10 50 200 --workers 4
+"""
+import argparse
+import json
+import statistics
+import time
+from benchmarks.pdfgen import corpus
+from pdf_extract import BACKENDS, PdfExtractor
+
+
+def run(page_counts, workers, repeat):
+    documents = corpus(page_counts)
+    report = {"page_counts": page_counts, "workers": workers, "runs": []}
+    for backend in BACKENDS:
+        for label, extractor in (
+            ("serial", PdfExtractor(workers=1, max_pages=0, max_bytes=0)),
+            ("parallel", PdfExtractor(workers=workers, parallel_min_pages=2, max_pages=0, max_bytes=0))
+        ):
+            # Warm the process pool so its start-up is not timed
+            extractor.extract(documents[0], backend)
+            for pages, data in zip(page_counts, documents):
+                wall = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    extraction = extractor.extract(data, backend)
+                    wall.append(time.perf_counter() - start)
+                report["runs"].append({
+                    "backend": backend,
+                    "mode": label,
+                    "pages": pages,
+                    "bytes": len(data),
+                    "seconds": round(min(wall), 4),
+                    "pages_per_second": round(pages / min(wall), 1),
+                    "page_ms_median": round(statistics.median(extraction.seconds) * 1000, 3),
+                    "page_ms_max": round(max(extraction.seconds) * 1000, 3),
+                    "chars": sum(len(page) for page in extraction.pages)
+                })
+            extractor.shutdown()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.pages, args.workers, args.repeat)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Minimal text-only PDF writer for generating benchmark corpora."""
+import random
+
+
+def _escape(line):
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def pdf_bytes(lines_per_page):
+    """A valid PDF with one Helvetica page per list of lines"""
+    objects = {
+        1: "<< /Type /Catalog /Pages 2 0 R >>",
+        3: "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+    }
+    kids = []
+    next_id = 4
+    for lines in lines_per_page:
+        stream = "BT /F1 11 Tf 50 780 Td 14 TL " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        objects[content_id] = f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream"
+        objects[page_id] = (
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        )
+        kids.append(page_id)
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(f'{kid} 0 R' for kid in kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(out)
+        out += f"{number} 0 obj\n{objects[number]}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    size = max(objects) + 1
+    out += f"xref\n0 {size}\n0000000000 65535 f \n".encode()
+    for number in range(1, size):
+        out += f"{offsets[number]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {size} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+def random_document(pages, lines_per_page=45, words_per_line=11, seed=0):
+    """PDF bytes of ``pages`` pages of random words"""
+    rng = random.Random(seed)
+    vocab = [f"word{i}" for i in range(5000)]
+    return pdf_bytes([
+        [" ".join(rng.choices(vocab, k=words_per_line)) for _ in range(lines_per_page)]
+        for _ in range(pages)
+    ])
+
+
+def corpus(page_counts, seed=0):
+    """One generated document per entry of ``page_counts``"""
+    return [random_document(pages, seed=seed + i) for i, pages in enumerate(page_counts)]
@@ -0,0 +1,88 @@
+"""Compare exact all-pairs plagiarism scoring with MinHash/LSH candidates.
+
+Run from backend/python:
+
+    python -m benchmarks.plagiarism_lsh --docs 2000 --configs 128:32 128:16 256:64
+"""
+import argparse
+import json
+import random
+import time
+from sklearn.feature_extraction.text import TfidfVectorizer
+from plagiarism import flagged_pairs, minhash_pairs
+
+
+def synthetic_corpus(docs, words_per_doc, copy_rate, edit_rate, seed=0):
+    """Random documents where ``copy_rate`` of them are edited copies of an earlier one"""
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(20000)]
+    weights = [1 / (rank + 1) for rank in range(len(vocab))]
+    texts = []
+    for i in range(docs):
+        if texts and rng.random() < copy_rate:
+            words = rng.choice(texts).split()
+            for pos in range(len(words)):
+                if rng.random() < edit_rate:
+                    words[pos] = rng.choices(vocab, weights)[0]
+        else:
+            words = rng.choices(vocab, weights, k=words_per_doc)
+        texts.append(" ".join(words))
+    return texts
+
+
+def run(docs, words_per_doc, copy_rate, edit_rate, threshold, configs):
+    texts = synthetic_corpus(docs, words_per_doc, copy_rate, edit_rate)
+    tfidf_matrix = TfidfVectorizer().fit_transform(texts)
+
+    start = time.perf_counter()
+    rows, cols, _ = flagged_pairs(tfidf_matrix, threshold)
+    exact_seconds = time.perf_counter() - start
+    truth = set(zip(rows.tolist(), cols.tolist()))
+
+    report = {
+        "docs": docs,
+        "words_per_doc": words_per_doc,
+        "threshold": threshold,
+        "exact": {"seconds": round(exact_seconds, 4), "flagged": len(truth)},
+        "minhash": []
+    }
+    for num_perm, bands in configs:
+        start = time.perf_counter()
+        rows, cols, sims = minhash_pairs(texts, tfidf_matrix, num_perm=num_perm, bands=bands)
+        seconds = time.perf_counter() - start
+        keep = sims >= threshold
+        found = set(zip(rows[keep].tolist(), cols[keep].tolist()))
+        report["minhash"].append({
+            "num_perm": num_perm,
+            "bands": bands,
+            "seconds": round(seconds, 4),
+            "candidates": len(sims),
+            "flagged": len(found),
+            "recall": round(len(found & truth) / len(truth), 4) if truth else 1.0
+        })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--words", type=int, default=400)
+    parser.add_argument("--copy-rate", type=float, default=0.1)
+    parser.add_argument("--edit-rate", type=float, default=0.1)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--configs", nargs="+", default=["64:16", "128:32", "128:16", "256:64"],
+                        help="num_perm:bands pairs to try")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    configs = [tuple(int(v) for v in c.split(":")) for c in args.configs]
+    report = run(args.docs, args.words, args.copy_rate, args.edit_rate, args.threshold, configs)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""Compare the linear segmenter with the legacy backtracking regexes.
+
+Run from backend/python:
+
+    python -m benchmarks.segmenter --questions 10 100 400 --fuzz 2000
+
+The fuzz pass generates random scripts mixing every question and answer
+marker with separators, blank lines and '#'-escaped newlines, and exits
+non-zero if any segmentation differs from the legacy one.
+"""
+import argparse
+import json
+import random
+import re
+import sys
+import time
+from segmenter import segment
+
+LEGACY_QUESTION_PATTERN = r'''
+    (?<!\#)
+    \n
+    (?=
+        (?:Q\.?\s*\d+\b)
+        |(?:Question\s+\d+\b)
+        |(?:^\d+[\.\)]\s)
+        |(?:^\[\d+\]\s)
+    )
+'''
+
+
+def legacy_process_blocks(text):
+    raw_blocks = re.split(LEGACY_QUESTION_PATTERN, text,
+                          flags=re.VERBOSE | re.IGNORECASE | re.MULTILINE)
+    question_block_re = re.compile(
+        r'^\s*(Q\.?|Question|\d+[.)]|\[\d+\])',
+        re.IGNORECASE | re.MULTILINE
+    )
+    return [b.strip() for b in raw_blocks
+            if b.strip() and question_block_re.search(b)]
+
+
+def legacy_extract_answers(blocks):
+    answers = []
+    answer_pattern = re.compile(
+        r'(?i)(?:answer|ans|solution)[\s:\-]*((?:.(?!\b(?:Q|Question)\b))*.+)',
+        re.DOTALL
+    )
+    for block in blocks:
+        match = answer_pattern.search(block)
+        if match:
+            answer = match.group(1).strip()
+            answer = '\n'.join([p.strip() for p in answer.split('\n') if p.strip()])
+            answers.append(answer)
+        else:
+            answers.append("")
+    return answers
+
+
+def legacy_segment(text):
+    return legacy_extract_answers(legacy_process_blocks(text))
+
+
+def synthetic_script(questions, answer_words, seed=0):
+    """A well-formed answer script with ``questions`` long answers"""
+    rng = random.Random(seed)
+    vocab = [f"term{i}" for i in range(3000)] + ["quick", "question", "q", "answered", "plans"]
+    markers = ["Q{n}.", "Question {n}:", "{n}.", "{n})", "[{n}]", "Q.{n}"]
+    lines = []
+    for n in range(1, questions + 1):
+        lines.append(rng.choice(markers).format(n=n) + " Explain " + " ".join(rng.choices(vocab, k=6)) + "?")
+        lines.append(rng.choice(["Ans:", "Answer -", "Solution:", "ans"]))
+        words = rng.choices(vocab, k=answer_words)
+        for start in range(0, len(words), 12):
+            lines.append(" ".join(words[start:start + 12]))
+    return "\n".join(lines) + "\n"
+
+
+def fuzz_script(rng):
+    """Short random text built from marker fragments and edge cases"""
+    pieces = [
+        "\n", "\n\n", "  \n", "#\n", "\r\n", " ", "\t", ":", "-", ":-", " : ",
+        "Q1", "q 2", "Q.3", "Q\n4", "Question 5", "question  6", "7.", "8)", "[9]", "10. ", "11) ", "[12] ",
+        "Answer", "answer", "ANS", "ans", "Solution", "solution:", "transport", "plans", "answered",
+        "quick", "Quiz", "3.14", "x", "word", "Q", "Question", "\u00a0", "\f"
+    ]
+    return "".join(rng.choice(pieces) for _ in range(rng.randint(0, 40)))
+
+
+def fuzz(cases, seed=0):
+    rng = random.Random(seed)
+    mismatches = []
+    for case in range(cases):
+        text = fuzz_script(rng)
+        if segment(text) != legacy_segment(text):
+            mismatches.append(text)
+    return mismatches
+
+
+def timed(fn, text, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run(question_counts, answer_words, repeat, fuzz_cases, blank_lines):
+    report = {"answer_words": answer_words, "scripts": [], "fuzz": {}}
+    for questions in question_counts:
+        text = synthetic_script(questions, answer_words, seed=questions)
+        legacy_seconds, legacy_answers = timed(legacy_segment, text, repeat)
+        seconds, answers = timed(segment, text, repeat)
+        report["scripts"].append({
+            "questions": questions,
+            "chars": len(text),
+            "legacy_seconds": round(legacy_seconds, 5),
+            "seconds": round(seconds, 5),
+            "speedup": round(legacy_seconds / seconds, 1) if seconds else None,
+            "identical": answers == legacy_answers
+        })
+
+    # A block with a long run of whitespace-only lines: the legacy question
+    # check rescans the rest of the run from every line start
+    text = "x" + " \n" * blank_lines + "y"
+    legacy_seconds, legacy_answers = timed(legacy_segment, text, 1)
+    seconds, answers = timed(segment, text, 1)
+    report["blank_lines"] = {
+        "lines": blank_lines,
+        "legacy_seconds": round(legacy_seconds, 5),
+        "seconds": round(seconds, 5),
+        "identical": answers == legacy_answers
+    }
+
+    mismatches = fuzz(fuzz_cases)
+    report["fuzz"] = {"cases": fuzz_cases, "mismatches": len(mismatches), "examples": mismatches[:5]}
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, nargs="+", default=[10, 100, 400])
+    parser.add_argument("--answer-words", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--blank-lines", type=int, default=5000)
+    parser.add_argument("--fuzz", type=int, default=2000, help="random scripts to compare")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = run(args.questions, args.answer_words, args.repeat, args.fuzz, args.blank_lines)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    identical = all(s["identical"] for s in report["scripts"]) and report["blank_lines"]["identical"]
+    if report["fuzz"]["mismatches"] or not identical:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""Local HTTP server for benchmark files, held in memory."""
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def serve(files, delay=0.0):
+    """Serve ``{name: bytes}`` at ``/<name>`` on a free port; returns (server, base URL).
+
+    ``delay`` seconds are slept before each response to mimic a remote store.
+    Stop the server with ``server.shutdown()``.
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = files.get(self.path.lstrip("/"))
+            if delay:
+                time.sleep(delay)
+            if body is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/pdf")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
@@ -1,30 +1,19 @@
 import sys
 import json
-from PyPDF2 import PdfReader
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from plagiarism import flagged_pairs, minhash_pairs
 import re
 import nltk
-import os
+from config import PLAGIARISM_PDF_BACKEND
+from pdf_extract import extract_pages
+from startup import use_local_resources, missing_nltk_data
 
-# Configure NLTK with more robust download handling
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('tokenizers/punkt_tab')  # Add this line
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    print("Downloading required NLTK data files...", file=sys.stderr)
-    try:
-        nltk.download('punkt')
-        nltk.download('punkt_tab')  # Add this download
-        nltk.download('stopwords')
-    except Exception as e:
-        print(f"Failed to download NLTK data: {str(e)}", file=sys.stderr)
-        sys.exit(1)
-
-# Set NLTK data path explicitly
-nltk_data_path = os.path.join(os.path.expanduser('~'), 'nltk_data')
-nltk.data.path.append(nltk_data_path)
+# NLTK data is bundled with the service (python -m startup --bundle); never download here
+use_local_resources()
+missing = missing_nltk_data(["punkt", "stopwords"])
+if missing:
+    print(f"Missing bundled NLTK data: {', '.join(missing)}", file=sys.stderr)
+    sys.exit(1)
 
 from nltk.corpus import stopwords
 from nltk.tokenize import word_tokenize
@@ -32,10 +21,10 @@ from nltk.tokenize import word_tokenize
 def extract_text(pdf_path):
     try:
         with open(pdf_path, 'rb') as f:
-            reader = PdfReader(f)
-            text = " ".join([page.extract_text() or "" for page in reader.pages])
-            print(f"Raw text from {pdf_path}: {text[:200]}...")
-            return clean_text(text)
+            pdf_bytes = f.read()
+        text = " ".join(extract_pages(pdf_bytes, PLAGIARISM_PDF_BACKEND))
+        print(f"Raw text from {pdf_path}: {text[:200]}...")
+        return clean_text(text)
     except Exception as e:
         print(f"Error processing {pdf_path}: {str(e)}", file=sys.stderr)
         return ""
@@ -62,8 +51,7 @@ def calculate_similarity(texts):
             stop_words=stopwords.words('english'),
             token_pattern=None  # Explicitly set to None since we're using tokenizer
         )
-        tfidf_matrix = vectorizer.fit_transform(texts)
-        return cosine_similarity(tfidf_matrix)
+        return vectorizer.fit_transform(texts)
     except Exception as e:
         print(f"Similarity calculation error: {str(e)}", file=sys.stderr)
         raise
@@ -90,18 +78,25 @@ def main():
             print(json.dumps([]))
             return
         
-        similarity_matrix = calculate_similarity(texts)
-        results = []
-        
-        for i in range(len(texts)):
-            for j in range(i+1, len(texts)):
-                similarity = similarity_matrix[i][j] * 100
-                if similarity >= threshold:
-                    results.append({
-                        'index1': valid_indices[i],
-                        'index2': valid_indices[j],
-                        'similarity': round(similarity, 2)
-                    })
+        tfidf_matrix = calculate_similarity(texts)
+        if input_data.get('strategy') == 'minhash':
+            rows, cols, sims = minhash_pairs(
+                texts, tfidf_matrix,
+                num_perm=input_data.get('num_perm', 128),
+                bands=input_data.get('bands', 32)
+            )
+            keep = sims >= threshold / 100
+            rows, cols, sims = rows[keep], cols[keep], sims[keep]
+        else:
+            rows, cols, sims = flagged_pairs(tfidf_matrix, threshold / 100)
+        results = [
+            {
+                'index1': valid_indices[i],
+                'index2': valid_indices[j],
+                'similarity': round(float(similarity) * 100, 2)
+            }
+            for i, j, similarity in zip(rows, cols, sims)
+        ]
         print(json.dumps(results))
         
     except Exception as e:
@@ -0,0 +1,90 @@
+import os
+
+# Local state (compiled answer keys, caches, indexes) lives under one directory
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("SMARTCHECK_DATA_DIR", os.path.join(BASE_DIR, "data"))
+
+# Evaluation
+EVAL_MODEL_NAME = os.environ.get("EVAL_MODEL_NAME", "all-MiniLM-L6-v2")
+# "torch", "onnx" or "onnx-int8"; see embedding_backends.py
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+# Instruction set the int8 export targets: arm64, avx2, avx512 or avx512_vnni.
+# avx2 runs on any recent x86-64 CPU; the avx512 variants only where supported
+ONNX_QUANTIZATION = os.environ.get("ONNX_QUANTIZATION", "avx2")
+EVAL_BATCH_SIZE = int(os.environ.get("EVAL_BATCH_SIZE", "64"))
+# Bounded memo tables for WordNet lemmas and per-text token lists
+LEMMA_CACHE_SIZE = int(os.environ.get("LEMMA_CACHE_SIZE", "100000"))
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", "4096"))
+ANSWER_KEY_DIR = os.environ.get("ANSWER_KEY_DIR", os.path.join(DATA_DIR, "answer_keys"))
+# Cache of answer embeddings across requests. Codecs: "float32", "float16",
+# "pca:<dims>" or "rp:<dims>" (float16 in a reduced basis); see embedding_store.py
+EMBEDDING_STORE = os.environ.get("EMBEDDING_STORE", "0") == "1"
+EMBEDDING_STORE_DIR = os.environ.get("EMBEDDING_STORE_DIR", os.path.join(DATA_DIR, "embeddings"))
+EMBEDDING_STORE_CODEC = os.environ.get("EMBEDDING_STORE_CODEC", "float16")
+EMBEDDING_STORE_FLUSH_ROWS = int(os.environ.get("EMBEDDING_STORE_FLUSH_ROWS", "1024"))
+# Reduced codecs fit their basis on this many vectors before anything is stored
+EMBEDDING_STORE_FIT_ROWS = int(os.environ.get("EMBEDDING_STORE_FIT_ROWS", "2048"))
+# Segments of a similar size are merged once this many accumulate; at most
+# EMBEDDING_STORE_OPEN_SEGMENTS stay memory-mapped at a time
+EMBEDDING_STORE_MERGE_FACTOR = int(os.environ.get("EMBEDDING_STORE_MERGE_FACTOR", "8"))
+EMBEDDING_STORE_OPEN_SEGMENTS = int(os.environ.get("EMBEDDING_STORE_OPEN_SEGMENTS", "64"))
+
+# PDF text extraction cache
+EXTRACTION_CACHE_DIR = os.environ.get("EXTRACTION_CACHE_DIR", os.path.join(DATA_DIR, "extraction_cache"))
+EXTRACTION_CACHE_MEMORY_ITEMS = int(os.environ.get("EXTRACTION_CACHE_MEMORY_ITEMS", "256"))
+EXTRACTION_CACHE_DISK_BYTES = int(os.environ.get("EXTRACTION_CACHE_DISK_MB", "512")) * 1024 * 1024
+
+# Downloads
+DOWNLOAD_MAX_CONNECTIONS = int(os.environ.get("DOWNLOAD_MAX_CONNECTIONS", "64"))
+DOWNLOAD_PER_HOST = int(os.environ.get("DOWNLOAD_PER_HOST", "8"))
+DOWNLOAD_TIMEOUT = float(os.environ.get("DOWNLOAD_TIMEOUT", "10"))
+DOWNLOAD_RETRIES = int(os.environ.get("DOWNLOAD_RETRIES", "2"))
+DOWNLOAD_BACKOFF = float(os.environ.get("DOWNLOAD_BACKOFF", "0.5"))
+
+# CPU-bound stages (PDF parsing, TF-IDF, clustering, encoding) run on this pool.
+# With "process" every worker loads its own copy of the sentence model.
+WORKER_POOL_KIND = os.environ.get("WORKER_POOL_KIND", "thread")
+WORKER_POOL_SIZE = int(os.environ.get("WORKER_POOL_SIZE", str(os.cpu_count() or 1)))
+WORKER_QUEUE_DEPTH = int(os.environ.get("WORKER_QUEUE_DEPTH", str(4 * WORKER_POOL_SIZE)))
+
+# Plagiarism indexes
+PLAGIARISM_INDEX_DIR = os.environ.get("PLAGIARISM_INDEX_DIR", os.path.join(DATA_DIR, "plagiarism_index"))
+CORPUS_INDEX_DIR = os.environ.get("CORPUS_INDEX_DIR", os.path.join(DATA_DIR, "corpus_index"))
+# Corpus segments of a similar size are merged once this many accumulate; at
+# most CORPUS_INDEX_OPEN_SEGMENTS stay memory-mapped per open corpus
+CORPUS_INDEX_MERGE_FACTOR = int(os.environ.get("CORPUS_INDEX_MERGE_FACTOR", "8"))
+CORPUS_INDEX_OPEN_SEGMENTS = int(os.environ.get("CORPUS_INDEX_OPEN_SEGMENTS", "64"))
+
+# Streaming (NDJSON) responses
+STREAM_BLOCK_ROWS = int(os.environ.get("STREAM_BLOCK_ROWS", "256"))
+EVAL_STREAM_CHUNK = int(os.environ.get("EVAL_STREAM_CHUNK", "32"))
+
+# Background jobs
+JOBS_DB_PATH = os.environ.get("JOBS_DB_PATH", os.path.join(DATA_DIR, "jobs.sqlite3"))
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "2"))
+
+# Running class-performance aggregates; see aggregates.py
+AGGREGATES_DB_PATH = os.environ.get("AGGREGATES_DB_PATH", os.path.join(DATA_DIR, "aggregates.sqlite3"))
+
+# PDF text extraction. "pypdf2" or "pdfminer"; grading keeps pdfminer's line layout
+PLAGIARISM_PDF_BACKEND = os.environ.get("PLAGIARISM_PDF_BACKEND", "pypdf2")
+EVAL_PDF_BACKEND = os.environ.get("EVAL_PDF_BACKEND", "pdfminer")
+PDF_MAX_BYTES = int(os.environ.get("PDF_MAX_MB", "50")) * 1024 * 1024
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", "500"))
+# Documents with at least this many pages are split across PDF_PAGE_WORKERS processes
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "16"))
+PDF_PAGE_WORKERS = int(os.environ.get("PDF_PAGE_WORKERS", str(os.cpu_count() or 1)))
+
+# Offline start-up: NLTK data and sentence model weights bundled with the service
+# (fill them with `python -m startup --bundle` at build time)
+NLTK_DATA_DIR = os.environ.get("NLTK_DATA_DIR", os.path.join(BASE_DIR, "nltk_data"))
+MODEL_DIR = os.environ.get("MODEL_DIR", os.path.join(BASE_DIR, "models"))
+OFFLINE = os.environ.get("SMARTCHECK_OFFLINE", "1") == "1"
+WARM_UP = os.environ.get("WARM_UP", "1") == "1"
+
+# Per-request profiling, requested with an "X-Profile: 1" header or ?profile=1.
+# Off unless PROFILING=1; see profiling.py
+PROFILING = os.environ.get("PROFILING", "0") == "1"
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(DATA_DIR, "profiles"))
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "100"))
+PROFILE_TOP = int(os.environ.get("PROFILE_TOP", "40"))
@@ -0,0 +1,294 @@
+import os
+import json
+import math
+import shutil
+import threading
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from config import CORPUS_INDEX_DIR, CORPUS_INDEX_MERGE_FACTOR, CORPUS_INDEX_OPEN_SEGMENTS
+from plagiarism_index import vectorizer, file_lock
+
+
+def weighted_rows(texts):
+    """Sublinear-tf, l2-normalized hashed term vectors.
+
+    The corpus grows forever, so there is no stable idf to weight by; stored
+    postings keep the same weights no matter how many documents follow.
+    """
+    counts = vectorizer.transform(texts).astype(np.float32)
+    counts.data = 1 + np.log(counts.data)
+    return normalize(counts, norm="l2", copy=False).tocsr()
+
+
+class CorpusSegment:
+    """One immutable batch of postings, stored as memory-mapped .npy arrays.
+
+    ``terms`` holds the sorted hashed term ids present in the segment and
+    ``term_ptr[i]:term_ptr[i + 1]`` slices the postings of ``terms[i]`` out of
+    ``doc`` (segment-local document numbers) and ``weight``.
+    """
+
+    FILES = ("terms", "term_ptr", "doc", "weight")
+
+    def __init__(self, path):
+        self.path = path
+        for name in self.FILES:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+        self._doc_ids = None
+
+    @property
+    def doc_ids(self):
+        if self._doc_ids is None:
+            with open(os.path.join(self.path, "docs.json"), encoding="utf-8") as f:
+                self._doc_ids = json.load(f)
+        return self._doc_ids
+
+    @classmethod
+    def write(cls, path, doc_ids, rows):
+        columns = rows.tocsc()
+        lengths = np.diff(columns.indptr)
+        terms = np.flatnonzero(lengths).astype(np.int32)
+        term_ptr = np.concatenate([[0], np.cumsum(lengths[terms])]).astype(np.int64)
+        arrays = {
+            "terms": terms,
+            "term_ptr": term_ptr,
+            "doc": columns.indices.astype(np.int32),
+            "weight": columns.data.astype(np.float32)
+        }
+
+        tmp_path = f"{path}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+        with open(os.path.join(tmp_path, "docs.json"), "w", encoding="utf-8") as f:
+            json.dump(list(doc_ids), f)
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    def scores(self, query_rows):
+        """Dot products of the query rows with every segment document they share terms with"""
+        query_terms = np.unique(query_rows.indices)
+        pos = np.searchsorted(self.terms, query_terms)
+        in_range = pos < len(self.terms)
+        hit = np.zeros(len(query_terms), dtype=bool)
+        hit[in_range] = self.terms[pos[in_range]] == query_terms[in_range]
+        matched_terms, matched_pos = query_terms[hit], pos[hit]
+        if len(matched_terms) == 0:
+            return sparse.csr_matrix((query_rows.shape[0], len(self.doc_ids)), dtype=np.float32)
+
+        # Gather only the postings of the matched terms
+        starts = np.asarray(self.term_ptr[matched_pos])
+        lengths = np.asarray(self.term_ptr[matched_pos + 1]) - starts
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        gather = np.arange(lengths.sum()) + offsets
+        postings = sparse.csr_matrix(
+            (np.asarray(self.weight[gather]),
+             (np.repeat(np.arange(len(matched_terms)), lengths), np.asarray(self.doc[gather]))),
+            shape=(len(matched_terms), len(self.doc_ids))
+        )
+        return query_rows[:, matched_terms] @ postings
+
+    def rows(self):
+        """The weighted document rows the segment was written from"""
+        terms = np.repeat(np.asarray(self.terms), np.diff(np.asarray(self.term_ptr)))
+        return sparse.csr_matrix(
+            (np.asarray(self.weight), (np.asarray(self.doc), terms)),
+            shape=(len(self.doc_ids), vectorizer.n_features)
+        )
+
+
+class CorpusIndex:
+    """Append-only postings of every past submission in a corpus (e.g. a course).
+
+    Every append writes a new segment. Segments are grouped into size tiers
+    (powers of ``merge_factor`` times ``batch_size`` documents) and a tier
+    is merged into one segment once it holds ``merge_factor`` of them, so a
+    corpus of n documents is queried over O(log n) segments. At most
+    ``open_segments`` segments stay memory-mapped, least recently used
+    closed first.
+    """
+
+    def __init__(self, path, merge_factor=CORPUS_INDEX_MERGE_FACTOR, open_segments=CORPUS_INDEX_OPEN_SEGMENTS,
+                 batch_size=500):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self.merge_factor = max(2, merge_factor)
+        self.open_segments = max(1, open_segments)
+        self.batch_size = batch_size
+        self._segments = OrderedDict()
+        self._load_manifest()
+
+    def _load_manifest(self):
+        self.manifest = {"segments": [], "sizes": {}, "documents": 0, "next": 0}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def segment(self, name):
+        segment = self._segments.get(name)
+        if segment is not None:
+            self._segments.move_to_end(name)
+            return segment
+        segment = self._segments[name] = CorpusSegment(os.path.join(self.path, "segments", name))
+        while len(self._segments) > self.open_segments:
+            self._segments.popitem(last=False)
+        return segment
+
+    def _write_segment(self, doc_ids, rows, at=None):
+        """Write a segment and list it in the manifest at position ``at`` (default last)"""
+        name = f"{self.manifest['next']:06d}"
+        os.makedirs(os.path.join(self.path, "segments"), exist_ok=True)
+        CorpusSegment.write(os.path.join(self.path, "segments", name), doc_ids, rows)
+        segments = self.manifest["segments"]
+        segments.insert(len(segments) if at is None else at, name)
+        self.manifest["sizes"][name] = len(doc_ids)
+        self.manifest["next"] += 1
+        return name
+
+    def append(self, doc_ids, texts):
+        """Write one batch of documents as a new segment, merging a full size tier"""
+        if not texts:
+            return
+        self._write_segment(doc_ids, weighted_rows(texts))
+        self.manifest["documents"] += len(texts)
+        self._save_manifest()
+        self._merge()
+
+    def append_stream(self, documents):
+        """Consume an iterable of (doc_id, text) pairs, one segment per ``batch_size``"""
+        doc_ids, texts = [], []
+        for doc_id, text in documents:
+            doc_ids.append(doc_id)
+            texts.append(text)
+            if len(texts) >= self.batch_size:
+                self.append(doc_ids, texts)
+                doc_ids, texts = [], []
+        self.append(doc_ids, texts)
+
+    def _tier(self, documents):
+        return int(math.log(max(documents / self.batch_size, 1), self.merge_factor))
+
+    def _merge(self):
+        """Merge the smallest size tier holding ``merge_factor`` segments until none does"""
+        while True:
+            tiers = {}
+            for name in self.manifest["segments"]:
+                tiers.setdefault(self._tier(self.manifest["sizes"][name]), []).append(name)
+            full = [names for _, names in sorted(tiers.items()) if len(names) >= self.merge_factor]
+            if not full:
+                return
+            self._merge_segments(full[0])
+
+    def _merge_segments(self, names):
+        segments = [self.segment(name) for name in names]
+        doc_ids = [doc_id for segment in segments for doc_id in segment.doc_ids]
+        rows = sparse.vstack([segment.rows() for segment in segments]).tocsr()
+
+        # The merged segment takes the place of the oldest one it replaces
+        at = self.manifest["segments"].index(names[0])
+        for name in names:
+            self.manifest["segments"].remove(name)
+            del self.manifest["sizes"][name]
+        self._write_segment(doc_ids, rows, at)
+        self._save_manifest()
+        for name in names:
+            self._segments.pop(name, None)
+            shutil.rmtree(os.path.join(self.path, "segments", name), ignore_errors=True)
+
+    def query(self, texts, threshold, top_k=None):
+        """Best historical matches for each text, segment by segment"""
+        query_rows = weighted_rows(texts)
+        while True:
+            try:
+                found = self._matches(query_rows, threshold)
+                break
+            except FileNotFoundError:
+                # Queries do not take the corpus lock; an append merged segments
+                # away since the manifest was read
+                self._load_manifest()
+
+        results = []
+        for matches in found:
+            matches.sort(key=lambda m: -m[0])
+            if top_k is not None:
+                matches = matches[:top_k]
+            results.append([
+                {"doc_id": doc_id, "similarity_score": round(value, 4)} for value, doc_id in matches
+            ])
+        return results
+
+    def _matches(self, query_rows, threshold):
+        found = [[] for _ in range(query_rows.shape[0])]
+        for name in self.manifest["segments"]:
+            segment = self.segment(name)
+            scores = segment.scores(query_rows).tocoo()
+            keep = scores.data >= threshold
+            for row, col, value in zip(scores.row[keep], scores.col[keep], scores.data[keep]):
+                found[row].append((float(value), segment.doc_ids[col]))
+        return found
+
+    def describe(self):
+        return {"segments": len(self.manifest["segments"]), "documents": self.manifest["documents"]}
+
+
+class CorpusStore:
+    def __init__(self, root=CORPUS_INDEX_DIR):
+        self.root = root
+        self._locks = defaultdict(threading.Lock)
+        self._guard = threading.Lock()
+
+    def _path(self, corpus_id):
+        if not corpus_id.replace("-", "").replace("_", "").isalnum():
+            raise ValueError(f"Invalid corpus id: {corpus_id}")
+        return os.path.join(self.root, corpus_id)
+
+    @contextmanager
+    def lock(self, corpus_id):
+        """Serialize appends to one corpus across threads and worker processes"""
+        path = self._path(corpus_id)
+        with self._guard:
+            thread_lock = self._locks[corpus_id]
+        with thread_lock, file_lock(f"{path}.lock"):
+            yield
+
+    def open(self, corpus_id):
+        return CorpusIndex(self._path(corpus_id))
+
+    def exists(self, corpus_id):
+        return os.path.exists(os.path.join(self._path(corpus_id), "manifest.json"))
+
+    def append(self, corpus_id, doc_ids, texts):
+        with self.lock(corpus_id):
+            index = self.open(corpus_id)
+            index.append_stream(zip(doc_ids, texts))
+            return index.describe()
+
+    def query(self, corpus_id, texts, threshold, top_k=None):
+        return self.open(corpus_id).query(texts, threshold, top_k)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_corpus_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = CorpusStore()
+    return _store
+
+# Picklable entry points for the worker pool; the store is resolved in the worker
+def add_to_corpus(corpus_id, doc_ids, texts):
+    return get_corpus_store().append(corpus_id, doc_ids, texts)
+
+def query_corpus(corpus_id, texts, threshold, top_k=None):
+    return get_corpus_store().query(corpus_id, texts, threshold, top_k)
@@ -0,0 +1,122 @@
+import asyncio
+from collections import defaultdict
+from urllib.parse import urlsplit
+import httpx
+from config import (
+    DOWNLOAD_MAX_CONNECTIONS, DOWNLOAD_PER_HOST, DOWNLOAD_TIMEOUT,
+    DOWNLOAD_RETRIES, DOWNLOAD_BACKOFF, PDF_MAX_BYTES
+)
+
+from metrics import DOWNLOAD_SECONDS
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class DownloadError(Exception):
+    def __init__(self, url, reason):
+        super().__init__(f"Failed to download {url}: {reason}")
+        self.url = url
+        self.reason = reason
+
+
+class DownloadTooLarge(DownloadError):
+    """A body larger than the download size limit"""
+
+
+class Downloader:
+    """Shared async HTTP client with pooled connections and per-host limits"""
+
+    def __init__(self, max_connections=DOWNLOAD_MAX_CONNECTIONS, per_host=DOWNLOAD_PER_HOST,
+                 timeout=DOWNLOAD_TIMEOUT, retries=DOWNLOAD_RETRIES, backoff=DOWNLOAD_BACKOFF,
+                 max_bytes=PDF_MAX_BYTES):
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.max_bytes = max_bytes
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            follow_redirects=True
+        )
+        self._host_slots = defaultdict(lambda: asyncio.Semaphore(self.per_host))
+
+    async def fetch(self, url):
+        """Download one URL, retrying transport errors and retryable statuses"""
+        with DOWNLOAD_SECONDS.time():
+            return await self._fetch(url)
+
+    async def _fetch(self, url):
+        slots = self._host_slots[urlsplit(url).netloc]
+        attempt = 0
+        while True:
+            try:
+                async with slots, self.client.stream("GET", url) as response:
+                    if response.status_code in RETRY_STATUS and attempt < self.retries:
+                        raise httpx.HTTPStatusError(
+                            f"HTTP {response.status_code}", request=response.request, response=response
+                        )
+                    response.raise_for_status()
+                    return await self._read_body(url, response)
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                retryable = isinstance(e, httpx.TransportError) or e.response.status_code in RETRY_STATUS
+                if not retryable or attempt >= self.retries:
+                    raise DownloadError(url, str(e)) from e
+                await asyncio.sleep(self.backoff * (2 ** attempt))
+                attempt += 1
+
+    async def _read_body(self, url, response):
+        """Read a streamed body, giving up as soon as it passes ``max_bytes``.
+
+        An oversized body is rejected from its declared length or while it
+        arrives, so it is never held in full; accepted bodies are returned
+        in memory.
+        """
+        declared = int(response.headers.get("content-length") or 0)
+        if self.max_bytes and declared > self.max_bytes:
+            raise DownloadTooLarge(url, f"{declared} bytes exceeds the {self.max_bytes} byte limit")
+
+        body = bytearray()
+        async for chunk in response.aiter_bytes():
+            body += chunk
+            if self.max_bytes and len(body) > self.max_bytes:
+                raise DownloadTooLarge(url, f"body exceeds the {self.max_bytes} byte limit")
+        return bytes(body)
+
+    async def fetch_all(self, urls, on_fetched=None):
+        """Download every URL concurrently, returning bodies in input order.
+
+        ``on_fetched(url)`` is called as each download completes.
+        """
+        async def fetch_one(url):
+            body = await self.fetch(url)
+            if on_fetched is not None:
+                on_fetched(url)
+            return body
+
+        tasks = [asyncio.ensure_future(fetch_one(url)) for url in urls]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_downloader = None
+
+def get_downloader():
+    """Return the process-wide downloader, creating it inside the running loop"""
+    global _downloader
+    if _downloader is None:
+        _downloader = Downloader()
+    return _downloader
+
+async def close_downloader():
+    global _downloader
+    if _downloader is not None:
+        await _downloader.aclose()
+        _downloader = None
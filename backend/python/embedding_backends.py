@@ -0,0 +1,42 @@
+import os
+from config import EMBEDDING_BACKEND, ONNX_QUANTIZATION
+
+# "torch" runs the model in full precision; "onnx" runs the exported graph on
+# ONNX Runtime; "onnx-int8" runs a dynamically int8-quantized export.
+# The ONNX backends need the sentence-transformers[onnx] extra installed.
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def onnx_file(backend, quantization=ONNX_QUANTIZATION):
+    """Model-relative path of the ONNX graph a backend loads"""
+    if backend == "onnx-int8":
+        return f"onnx/model_qint8_{quantization}.onnx"
+    return "onnx/model.onnx"
+
+
+def load_sentence_model(source, backend=EMBEDDING_BACKEND):
+    from sentence_transformers import SentenceTransformer
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {backend}")
+    if backend == "torch":
+        return SentenceTransformer(source)
+    return SentenceTransformer(source, backend="onnx", model_kwargs={"file_name": onnx_file(backend)})
+
+
+def model_id(model_name, backend=EMBEDDING_BACKEND):
+    """Identity of the vectors a backend produces; compiled answer keys are stored per id"""
+    return model_name if backend == "torch" else f"{model_name}+{backend}"
+
+
+def export_backend(source, backend, target):
+    """Write the ONNX graph ``backend`` needs into the model directory ``target`` (network/CPU heavy)"""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+
+    if backend == "torch":
+        return
+    if not os.path.exists(os.path.join(target, onnx_file("onnx"))):
+        SentenceTransformer(source, backend="onnx").save(target)
+    if backend == "onnx-int8" and not os.path.exists(os.path.join(target, onnx_file(backend))):
+        model = SentenceTransformer(target, backend="onnx")
+        export_dynamic_quantized_onnx_model(model, ONNX_QUANTIZATION, target)
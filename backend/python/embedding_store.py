@@ -0,0 +1,421 @@
+import os
+import json
+import math
+import time
+import fcntl
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from config import (
+    EMBEDDING_STORE_DIR, EMBEDDING_STORE_CODEC, EMBEDDING_STORE_FLUSH_ROWS, EMBEDDING_STORE_FIT_ROWS,
+    EMBEDDING_STORE_MERGE_FACTOR, EMBEDDING_STORE_OPEN_SEGMENTS
+)
+
+
+def text_key(text):
+    """16-byte content address of an embedded text"""
+    return hashlib.sha256(text.encode("utf-8")).digest()[:16]
+
+
+def unit_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms > 0, norms, 1)
+
+
+class Codec:
+    """How vectors are stored: "float32", "float16", or float16 coordinates
+    in a reduced basis, "pca:<dims>" (principal components of the first
+    batch stored) or "rp:<dims>" (a random orthonormal projection).
+
+    Decoded vectors are mapped back to the model's width and re-normalized,
+    so callers always get unit rows they can dot with fresh embeddings.
+    """
+
+    def __init__(self, spec):
+        method, _, dims = spec.partition(":")
+        if not ((method in ("float32", "float16") and not dims) or (method in ("pca", "rp") and dims.isdigit())):
+            raise ValueError(f"Unknown embedding codec: {spec}")
+        self.spec = spec
+        self.method = method
+        self.dims = int(dims) if dims else None
+        self.dtype = np.float32 if method == "float32" else np.float16
+        self.mean = None
+        self.basis = None
+
+    @property
+    def reduced(self):
+        return self.dims is not None
+
+    def fit(self, vectors, seed=0):
+        """Choose the reduced basis from a sample of vectors (no-op for full-width codecs)"""
+        if not self.reduced:
+            return self
+        width = vectors.shape[1]
+        if self.dims > width:
+            raise ValueError(f"Cannot reduce {width}-dim vectors to {self.dims} dims")
+        if self.method == "pca":
+            mean = vectors.mean(axis=0)
+            leading = np.linalg.svd(vectors - mean, full_matrices=False)[2][:self.dims]
+        else:
+            mean = np.zeros(width)
+            leading = np.empty((0, width))
+        # A small first batch has fewer components than dims; complete the
+        # basis with random directions
+        filler = np.random.default_rng(seed).standard_normal((self.dims - len(leading), width))
+        q = np.linalg.qr(np.vstack([leading, filler]).T)[0]
+        self.mean = mean.astype(np.float32)
+        self.basis = q.T.astype(np.float32)
+        return self
+
+    def encode(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.reduced:
+            vectors = (vectors - self.mean) @ self.basis.T
+        return vectors.astype(self.dtype)
+
+    def decode(self, stored):
+        vectors = np.asarray(stored, dtype=np.float32)
+        if self.reduced:
+            vectors = vectors @ self.basis + self.mean
+        return unit_rows(vectors)
+
+    def bytes_per_vector(self, width):
+        return (self.dims or width) * np.dtype(self.dtype).itemsize
+
+    def save(self, path):
+        if self.reduced:
+            np.savez(path, mean=self.mean, basis=self.basis)
+
+    def load(self, path):
+        if self.reduced:
+            with np.load(path) as projection:
+                self.mean = projection["mean"]
+                self.basis = projection["basis"]
+        return self
+
+
+def compression_error(vectors, spec, pairs=5000, fit=None, seed=0):
+    """Cosine- and score-error a codec introduces on pairs of unit ``vectors``.
+
+    The codec is fitted on the first ``fit`` vectors (all by default), as a
+    store fits it on its first batch.
+    """
+    vectors = unit_rows(np.asarray(vectors, dtype=np.float32))
+    codec = Codec(spec).fit(vectors[:fit])
+    decoded = codec.decode(codec.encode(vectors))
+    rng = np.random.default_rng(seed)
+    left, right = rng.integers(0, len(vectors), (2, pairs))
+    exact = np.einsum('ij,ij->i', vectors[left], vectors[right])
+    approx = np.einsum('ij,ij->i', decoded[left], decoded[right])
+    cosine = np.abs(approx - exact)
+    # Grading scores are min(5 * cosine, 5)
+    score = np.abs(np.minimum(approx * 5, 5.0) - np.minimum(exact * 5, 5.0))
+    return {
+        "codec": spec,
+        "bytes_per_vector": codec.bytes_per_vector(vectors.shape[1]),
+        "pairs": pairs,
+        "cosine_mean_abs_error": round(float(cosine.mean()), 6),
+        "cosine_p99_abs_error": round(float(np.quantile(cosine, 0.99)), 6),
+        "cosine_max_abs_error": round(float(cosine.max()), 6),
+        "score_max_abs_error": round(float(score.max()), 4)
+    }
+
+
+def segment_name(rows):
+    """Unique, time-ordered segment directory name that records its row count"""
+    return f"{time.time_ns():020d}-{os.getpid()}-{rows}"
+
+
+class EmbeddingSegment:
+    """One immutable batch: sorted ``keys`` and their encoded ``vectors``, memory-mapped"""
+
+    def __init__(self, path):
+        self.path = path
+        self.keys = np.load(os.path.join(path, "keys.npy"), mmap_mode="r")
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+
+    @classmethod
+    def write(cls, path, keys, vectors):
+        """Write a segment, keeping one row per key"""
+        keys, first = np.unique(keys, return_index=True)
+        tmp_path = f"{path}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        np.save(os.path.join(tmp_path, "keys.npy"), keys)
+        np.save(os.path.join(tmp_path, "vectors.npy"), vectors[first])
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    def find(self, keys):
+        """Positions of ``keys`` in the segment and a mask of the ones present"""
+        pos = np.minimum(np.searchsorted(self.keys, keys), max(len(self.keys) - 1, 0))
+        return pos, self.keys[pos] == keys
+
+
+class EmbeddingStore:
+    """Append-only cache of one model's embeddings, keyed by text hash.
+
+    Vectors are buffered in memory and written as a new segment every
+    ``flush_rows`` vectors (and on ``flush``). Segment names are unique per
+    process, so worker processes can share one directory; vectors a process
+    has not flushed when it exits are simply embedded again later.
+
+    Reduced codecs are fitted once ``fit_rows`` vectors have been seen;
+    until then vectors are kept in memory at full precision.
+
+    Segments are grouped into size tiers (powers of ``merge_factor`` times
+    ``flush_rows``) and a tier is merged into one segment once it holds
+    ``merge_factor`` of them, so a store of n vectors has O(log n)
+    segments. Whichever process flushes does the merge, under a lock file
+    the others skip rather than wait on. At most ``open_segments`` segments
+    are memory-mapped at once, least recently used closed first.
+    """
+
+    def __init__(self, path, codec=EMBEDDING_STORE_CODEC, flush_rows=EMBEDDING_STORE_FLUSH_ROWS,
+                 fit_rows=EMBEDDING_STORE_FIT_ROWS, merge_factor=EMBEDDING_STORE_MERGE_FACTOR,
+                 open_segments=EMBEDDING_STORE_OPEN_SEGMENTS):
+        self.path = path
+        self.segments_path = os.path.join(path, "segments")
+        self.meta_path = os.path.join(path, "meta.json")
+        self.codec = Codec(codec)
+        self.flush_rows = flush_rows
+        self.fit_rows = fit_rows if self.codec.reduced else 1
+        self.merge_factor = max(2, merge_factor)
+        self.open_segments = max(1, open_segments)
+        self.meta = None
+        # Segment names on disk, newest first, and the memory-mapped subset
+        self._names = []
+        self._segments = OrderedDict()
+        self._unfitted = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def _load_meta(self):
+        if self.meta is None and os.path.exists(self.meta_path):
+            with open(self.meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta["projection"]:
+                self.codec.load(os.path.join(self.path, meta["projection"]))
+            self.meta = meta
+        return self.meta
+
+    def _create_meta(self, vectors):
+        """Fit the codec on the first vectors and record the error it introduces"""
+        os.makedirs(self.path, exist_ok=True)
+        codec = Codec(self.codec.spec).fit(vectors)
+        meta = {
+            "codec": codec.spec,
+            "width": int(vectors.shape[1]),
+            "fitted_on": len(vectors),
+            "projection": f"projection-{os.getpid()}.npz" if codec.reduced else None,
+            "error": compression_error(vectors, codec.spec) if len(vectors) > 1 else None
+        }
+        if meta["projection"]:
+            codec.save(os.path.join(self.path, meta["projection"]))
+        tmp_path = f"{self.meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        try:
+            # The first process to publish its metadata wins; the others adopt it
+            os.link(tmp_path, self.meta_path)
+        except FileExistsError:
+            if meta["projection"]:
+                os.remove(os.path.join(self.path, meta["projection"]))
+        finally:
+            os.remove(tmp_path)
+        return self._load_meta()
+
+    def _refresh(self):
+        """Pick up segments other processes wrote and forget merged-away ones"""
+        if not os.path.isdir(self.segments_path):
+            return
+        self._names = sorted(
+            (name for name in os.listdir(self.segments_path) if not name.endswith(".tmp")), reverse=True
+        )
+        present = set(self._names)
+        for name in [name for name in self._segments if name not in present]:
+            del self._segments[name]
+
+    def _open(self, name):
+        """Memory-mapped segment ``name``, or None if it was merged away meanwhile"""
+        segment = self._segments.get(name)
+        if segment is not None:
+            self._segments.move_to_end(name)
+            return segment
+        try:
+            segment = EmbeddingSegment(os.path.join(self.segments_path, name))
+        except FileNotFoundError:
+            return None
+        self._segments[name] = segment
+        while len(self._segments) > self.open_segments:
+            self._segments.popitem(last=False)
+        return segment
+
+    def _rows(self, name):
+        parts = name.split("-")
+        if len(parts) == 3:
+            return int(parts[2])
+        segment = self._open(name)
+        return len(segment.keys) if segment is not None else 0
+
+    def get_many(self, texts):
+        """(found mask, unit vectors) for ``texts``; rows of missing texts are zero.
+
+        The vectors are None when nothing was found.
+        """
+        found = np.zeros(len(texts), dtype=bool)
+        digests = [text_key(text) for text in texts]
+        with self._lock:
+            if self._load_meta() is None:
+                hits = [(i, self._unfitted[d]) for i, d in enumerate(digests) if d in self._unfitted]
+                if not hits:
+                    return found, None
+                vectors = np.zeros((len(texts), len(hits[0][1])), dtype=np.float32)
+                for i, row in hits:
+                    vectors[i] = row
+                    found[i] = True
+                return found, vectors
+
+            self._refresh()
+            names = list(self._names)
+            stored = np.zeros((len(texts), self.codec.dims or self.meta["width"]), dtype=self.codec.dtype)
+            for i, digest in enumerate(digests):
+                if digest in self._pending:
+                    stored[i] = self._pending[digest]
+                    found[i] = True
+
+        keys = np.array(digests, dtype="S16")
+        for name in names:
+            missing = np.flatnonzero(~found)
+            if len(missing) == 0:
+                break
+            with self._lock:
+                segment = self._open(name)
+            if segment is None:
+                continue
+            pos, hit = segment.find(keys[missing])
+            stored[missing[hit]] = segment.vectors[pos[hit]]
+            found[missing[hit]] = True
+
+        if not found.any():
+            return found, None
+        vectors = np.zeros((len(texts), self.meta["width"]), dtype=np.float32)
+        vectors[found] = self.codec.decode(stored[found])
+        return found, vectors
+
+    def put_many(self, texts, vectors):
+        """Add vectors and return them as later lookups will (decoded from storage)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            if self._load_meta() is None:
+                for text, row in zip(texts, vectors):
+                    self._unfitted[text_key(text)] = row
+                if len(self._unfitted) < self.fit_rows:
+                    return vectors
+                self._create_meta(np.stack(list(self._unfitted.values())))
+
+            if self._unfitted:
+                encoded = self.codec.encode(np.stack(list(self._unfitted.values())))
+                self._pending.update(zip(self._unfitted, encoded))
+                self._unfitted = {}
+            encoded = self.codec.encode(vectors)
+            for text, row in zip(texts, encoded):
+                self._pending[text_key(text)] = row
+            if len(self._pending) >= self.flush_rows:
+                self._flush()
+        return self.codec.decode(encoded)
+
+    def _flush(self):
+        if not self._pending:
+            return
+        os.makedirs(self.segments_path, exist_ok=True)
+        name = segment_name(len(self._pending))
+        keys = np.array(list(self._pending), dtype="S16")
+        self._segments[name] = EmbeddingSegment.write(
+            os.path.join(self.segments_path, name), keys, np.stack(list(self._pending.values()))
+        )
+        self._pending = {}
+        self._merge()
+
+    def _tier(self, rows):
+        return int(math.log(max(rows / self.flush_rows, 1), self.merge_factor))
+
+    def _merge(self):
+        """Merge every size tier holding ``merge_factor`` segments, unless another process is merging"""
+        with open(os.path.join(self.path, "merge.lock"), "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            try:
+                while True:
+                    self._refresh()
+                    tiers = {}
+                    for name in self._names:
+                        tiers.setdefault(self._tier(self._rows(name)), []).append(name)
+                    full = [names for _, names in sorted(tiers.items()) if len(names) >= self.merge_factor]
+                    if not full:
+                        return
+                    self._merge_segments(full[0])
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _merge_segments(self, names):
+        segments = [segment for segment in map(self._open, names) if segment is not None]
+        keys = np.concatenate([np.asarray(segment.keys) for segment in segments])
+        vectors = np.concatenate([np.asarray(segment.vectors) for segment in segments])
+        merged = EmbeddingSegment.write(
+            os.path.join(self.segments_path, segment_name(len(np.unique(keys)))), keys, vectors
+        )
+        # The merged segment is visible before its sources go, so readers never miss a key
+        for name in names:
+            self._segments.pop(name, None)
+            shutil.rmtree(os.path.join(self.segments_path, name), ignore_errors=True)
+        self._segments[os.path.basename(merged.path)] = merged
+
+    def flush(self):
+        """Write buffered vectors as a segment (vectors of an unfitted codec stay in memory)"""
+        with self._lock:
+            self._flush()
+
+    def describe(self):
+        with self._lock:
+            meta = self._load_meta()
+            self._refresh()
+            stored = sum(self._rows(name) for name in self._names)
+            return {
+                "codec": self.codec.spec,
+                "width": meta["width"] if meta else None,
+                "bytes_per_vector": self.codec.bytes_per_vector(meta["width"]) if meta else None,
+                "segments": len(self._names),
+                "open_segments": len(self._segments),
+                "vectors": stored,
+                "pending": len(self._pending) + len(self._unfitted),
+                "fitted": meta is not None,
+                "error": meta["error"] if meta else None
+            }
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_embedding_store(model_id):
+    """Process-wide store for one model's vectors, under the configured codec"""
+    with _stores_lock:
+        if model_id not in _stores:
+            name = "".join(c if c.isalnum() or c in "-_." else "_" for c in model_id)
+            path = os.path.join(EMBEDDING_STORE_DIR, name, EMBEDDING_STORE_CODEC.replace(":", "-"))
+            _stores[model_id] = EmbeddingStore(path)
+        return _stores[model_id]
+
+def flush_embedding_stores():
+    with _stores_lock:
+        stores = list(_stores.values())
+    for store in stores:
+        store.flush()
+
+def embedding_store_stats():
+    with _stores_lock:
+        stores = dict(_stores)
+    return {model_id: store.describe() for model_id, store in stores.items()}
@@ -1,187 +1,277 @@
-import sys
-import json
-import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
-from nltk.stem import WordNetLemmatizer
-from sentence_transformers import SentenceTransformer
-from sklearn.metrics.pairwise import cosine_similarity
-
-# Download necessary NLTK data
-nltk.download('punkt', quiet=True)
-nltk.download('stopwords', quiet=True)
-nltk.download('wordnet', quiet=True)
-
-lemmatizer = WordNetLemmatizer()
-stop_words = set(stopwords.words('english'))
-model = SentenceTransformer("all-MiniLM-L6-v2")
-
-def extract_keywords(text):
-    tokens = word_tokenize(text.lower())
-    keywords = [lemmatizer.lemmatize(w) for w in tokens if w.isalnum() and w not in stop_words]
-    return set(keywords)
-
-def generate_detailed_feedback(student_text, reference_text, score, topic):
-    ref_keywords = extract_keywords(reference_text)
-    stud_keywords = extract_keywords(student_text)
-
-    matched = ref_keywords & stud_keywords
-    missing = ref_keywords - stud_keywords
-    extra = stud_keywords - ref_keywords
-
-    feedback_points = []
-
-    # Strength-based feedback
-    if score >= 4.5:
-        feedback_points.append("✅ Excellent understanding of the topic.")
-    elif score >= 3.0:
-        feedback_points.append("✅ Good attempt. You captured several important points.")
-    elif score > 0:
-        feedback_points.append("⚠️ The answer is partially correct but misses key areas.")
-    else:
-        feedback_points.append("❌ The answer does not address the expected concepts.")
-
-    # Keyword analysis
-    if matched:
-        feedback_points.append(f"✔️ Correctly mentioned: {', '.join(sorted(matched)[:5])}.")
-    if missing:
-        feedback_points.append(f"❌ Missing key concepts: {', '.join(sorted(missing)[:5])}.")
-    if extra:
-        feedback_points.append(f"📝 Contains irrelevant information: {', '.join(sorted(extra)[:3])}.")
-
-    # Suggestion
-    feedback_points.append("📌 Focus more on concepts like: " + ', '.join(sorted(ref_keywords)[:3]) + ".")
-
-    return feedback_points
-
-
-def preprocess(text):
-    try:
-        tokens = word_tokenize(text.lower())
-        words = [lemmatizer.lemmatize(w) for w in tokens if w.isalnum() and w not in stop_words]
-        return " ".join(words)
-    except Exception as e:
-        print(f"⚠️ Preprocessing error: {str(e)}", file=sys.stderr)
-        return ""
-
-def evaluate(student_file, answer_key):
-    try:
-        with open(student_file, encoding="utf-8") as sf, open(answer_key, encoding="utf-8") as ak:
-            student_text = sf.read()
-            reference_text = ak.read()
-
-        # Enhanced question splitting pattern
-        question_pattern = r'''
-            (?<!\#)                     # Negative lookbehind for #
-            \n                          # New line
-            (?=                         # Lookahead for question markers
-                (?:Q\.?\s*\d+\b)        # Q1, Q.1, Q 1
-                |(?:Question\s+\d+\b)   # Question 1
-                |(?:^\d+[\.\)]\s)       # 1., 1)
-                |(?:^\[\d+\]\s)         # [1]
-            )
-        '''
-
-        # Split and filter blocks for both student and reference
-        def process_blocks(text):
-            raw_blocks = re.split(question_pattern, text, 
-                                flags=re.VERBOSE|re.IGNORECASE|re.MULTILINE)
-            question_block_re = re.compile(
-                r'^\s*(Q\.?|Question|\d+[.)]|\[\d+\])', 
-                re.IGNORECASE | re.MULTILINE
-            )
-            return [b.strip() for b in raw_blocks 
-                   if b.strip() and question_block_re.search(b)]
-
-        student_blocks = process_blocks(student_text)
-        reference_blocks = process_blocks(reference_text)
-        # Answer extraction function
-        def extract_answers(blocks):
-            answers = []
-            answer_pattern = re.compile(
-                r'(?i)(?:answer|ans|solution)[\s:\-]*((?:.(?!\b(?:Q|Question)\b))*.+)',
-                re.DOTALL
-            )
-            for block in blocks:
-                match = answer_pattern.search(block)
-                if match:
-                    answer = match.group(1).strip()
-                    answer = '\n'.join([p.strip() for p in answer.split('\n') if p.strip()])
-                    answers.append(answer)
-                else:
-                    answers.append("")  # Mark missing answers
-            return answers
-
-        student_answers = extract_answers(student_blocks)
-        reference_answers = extract_answers(reference_blocks)
-
-        results = []
-        # Process based on reference answer length
-        for idx in range(1, len(reference_answers) + 1):
-            try:
-                stud = student_answers[idx-1] if idx <= len(student_answers) else ""
-                ref = reference_answers[idx-1]
-            except IndexError:
-                stud = ""
-                ref = ""
-
-            clean_stud = preprocess(stud)
-            clean_ref = preprocess(ref)
-
-            if not clean_stud or not clean_ref:
-                score = 0.0
-                similarity = 0.0
-                topic = "Missing Answer" if not clean_stud else "Error"
-            else:
-                try:
-                    emb_stud = model.encode(clean_stud)
-                    emb_ref = model.encode(clean_ref)
-                    raw_score = cosine_similarity([emb_stud], [emb_ref])[0][0]
-                    score = float(raw_score)
-                    similarity = round(score * 100, 2)
-                    score = round(min(score * 5, 5.0), 2)
-                    keywords = set(clean_ref.split()) - stop_words
-                    topic = ", ".join(sorted(keywords)[:3]) or "General"
-                except Exception as e:
-                    print(f"Scoring error for Q{idx}: {str(e)}", file=sys.stderr)
-                    score = 0.0
-                    similarity = 0.0
-                    topic = "Scoring Error"
-
-                feedback = generate_detailed_feedback(clean_stud, clean_ref, score, topic)
-
-                results.append({
-                    "question": idx,
-                    "score": score,
-                    "similarity": similarity,
-                    "topic": topic,
-                    "student_answer": stud,
-                    "reference_answer": ref,
-                    "feedback": feedback
-                })
-
-
-        # Handle question count mismatch
-        if len(student_answers) != len(reference_answers):
-            print(f"Question mismatch: Student {len(student_answers)} vs Reference {len(reference_answers)}", 
-                  file=sys.stderr)
-
-        print(json.dumps(results))
-
-    except Exception as e:
-        print(json.dumps({'error': str(e)}), file=sys.stderr)
-        sys.exit(1)
-
-def main():
-    try:
-        input_data = json.load(sys.stdin)
-        student_file = input_data["student_file"]
-        answer_key = input_data["answer_key"]
-        evaluate(student_file, answer_key)
-    except Exception as e:
-        print(json.dumps({'error': str(e)}), file=sys.stderr)
-        sys.exit(1)
-
-if __name__ == "__main__":
+import sys
+import json
+import threading
+from functools import lru_cache
+import numpy as np
+from nltk.corpus import stopwords
+from nltk.tokenize import word_tokenize
+from nltk.stem import WordNetLemmatizer
+from config import (
+    EVAL_BATCH_SIZE, EVAL_MODEL_NAME, EMBEDDING_BACKEND, EMBEDDING_STORE, LEMMA_CACHE_SIZE, TOKEN_CACHE_SIZE
+)
+from segmenter import segment
+from startup import use_local_resources, model_source
+from embedding_backends import load_sentence_model, model_id
+from embedding_store import get_embedding_store
+from metrics import CACHE_LOOKUPS, ENCODE_BATCH_SECONDS, ENCODE_BATCH_SIZE, SIMILARITY_SECONDS
+
+# NLTK data and model weights are bundled; see startup.py
+use_local_resources()
+
+MODEL_NAME = EVAL_MODEL_NAME
+
+lemmatizer = WordNetLemmatizer()
+
+@lru_cache(maxsize=None)
+def stop_word_set():
+    """English stopwords, loaded on first use so a missing corpus is reported by /readyz"""
+    return frozenset(stopwords.words('english'))
+
+@lru_cache(maxsize=LEMMA_CACHE_SIZE)
+def lemma(word):
+    return lemmatizer.lemmatize(word)
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def content_words(text):
+    """Lemmas of the alphanumeric, non-stopword tokens of a text, memoized per text"""
+    stop_words = stop_word_set()
+    return tuple(lemma(w) for w in word_tokenize(text.lower()) if w.isalnum() and w not in stop_words)
+
+@lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def extract_keywords(text):
+    return frozenset(content_words(text))
+
+def answer_features(text):
+    """Cleaned text and keyword set of one answer, shared by scoring and feedback"""
+    clean = preprocess(text)
+    return clean, extract_keywords(clean) if clean else frozenset()
+
+def generate_detailed_feedback(student_text, reference_text, score, topic, ref_keywords=None, stud_keywords=None):
+    if ref_keywords is None:
+        ref_keywords = extract_keywords(reference_text)
+    if stud_keywords is None:
+        stud_keywords = extract_keywords(student_text)
+
+    matched = ref_keywords & stud_keywords
+    missing = ref_keywords - stud_keywords
+    extra = stud_keywords - ref_keywords
+
+    feedback_points = []
+
+    # Strength-based feedback
+    if score >= 4.5:
+        feedback_points.append("✅ Excellent understanding of the topic.")
+    elif score >= 3.0:
+        feedback_points.append("✅ Good attempt. You captured several important points.")
+    elif score > 0:
+        feedback_points.append("⚠️ The answer is partially correct but misses key areas.")
+    else:
+        feedback_points.append("❌ The answer does not address the expected concepts.")
+
+    # Keyword analysis
+    if matched:
+        feedback_points.append(f"✔️ Correctly mentioned: {', '.join(sorted(matched)[:5])}.")
+    if missing:
+        feedback_points.append(f"❌ Missing key concepts: {', '.join(sorted(missing)[:5])}.")
+    if extra:
+        feedback_points.append(f"📝 Contains irrelevant information: {', '.join(sorted(extra)[:3])}.")
+
+    # Suggestion
+    feedback_points.append("📌 Focus more on concepts like: " + ', '.join(sorted(ref_keywords)[:3]) + ".")
+
+    return feedback_points
+
+
+def preprocess(text):
+    try:
+        return " ".join(content_words(text))
+    except Exception as e:
+        print(f"⚠️ Preprocessing error: {str(e)}", file=sys.stderr)
+        return ""
+
+
+class EvaluationEngine:
+    """Keeps the sentence model resident so answers can be scored in-process"""
+
+    def __init__(self, model_name=MODEL_NAME, batch_size=EVAL_BATCH_SIZE, backend=EMBEDDING_BACKEND):
+        self.model_name = model_name
+        self.backend = backend
+        # Keys compiled by one backend are not reused by another
+        self.model_id = model_id(model_name, backend)
+        self.model = load_sentence_model(model_source(model_name), backend)
+        self.batch_size = batch_size
+        self.store = get_embedding_store(self.model_id) if EMBEDDING_STORE else None
+
+    def encode(self, texts):
+        """Unit-length embeddings of texts, from the embedding store where cached"""
+        if self.store is None:
+            return self._encode(texts)
+        found, vectors = self.store.get_many(texts)
+        hits = int(found.sum())
+        CACHE_LOOKUPS.inc(hits, cache="embedding", result="hit")
+        CACHE_LOOKUPS.inc(len(texts) - hits, cache="embedding", result="miss")
+        if vectors is None:
+            return self.store.put_many(texts, self._encode(texts))
+        # Fresh vectors go through the store's codec so scores do not depend on cache state
+        missing = np.flatnonzero(~found)
+        if len(missing):
+            misses = [texts[i] for i in missing]
+            vectors[missing] = self.store.put_many(misses, self._encode(misses))
+        return vectors
+
+    def _encode(self, texts):
+        """Embed texts in batched forward passes as unit-length rows"""
+        ENCODE_BATCH_SIZE.observe(len(texts))
+        with ENCODE_BATCH_SECONDS.time():
+            return self.model.encode(
+                texts,
+                batch_size=self.batch_size,
+                normalize_embeddings=True,
+                convert_to_numpy=True
+            )
+
+    def compile_key(self, reference_text):
+        """Segment, clean and embed an answer key once so many scripts can share it"""
+        answers = segment(reference_text)
+        features = [answer_features(ref) for ref in answers]
+        clean = [c for c, _ in features]
+        keywords = [k for _, k in features]
+        topics = [", ".join(sorted(set(c.split()) - stop_word_set())[:3]) or "General" for c in clean]
+
+        embeddings = np.zeros((len(clean), self.model.get_sentence_embedding_dimension()), dtype=np.float32)
+        present = [i for i, c in enumerate(clean) if c]
+        if present:
+            embeddings[present] = self.encode([clean[i] for i in present])
+
+        return {
+            "answers": answers,
+            "clean": clean,
+            "keywords": keywords,
+            "topics": topics,
+            "embeddings": embeddings
+        }
+
+    def evaluate(self, student_text, reference_text):
+        """Score a student's answer script against the answer key text"""
+        return self.evaluate_many([student_text], reference_text)[0]
+
+    def evaluate_many(self, student_texts, key):
+        """Score a cohort of answer scripts against one answer key.
+
+        ``key`` is either the raw answer key text or the output of
+        ``compile_key``. Student answers from every script are embedded
+        together in large cross-student batches.
+        """
+        if isinstance(key, str):
+            key = self.compile_key(key)
+        reference_answers = key["answers"]
+
+        cohort = []
+        for student_text in student_texts:
+            student_answers = segment(student_text)
+
+            # Handle question count mismatch
+            if len(student_answers) != len(reference_answers):
+                print(f"Question mismatch: Student {len(student_answers)} vs Reference {len(reference_answers)}", 
+                      file=sys.stderr)
+
+            pairs = []
+            # Process based on reference answer length
+            for pos in range(len(reference_answers)):
+                stud = student_answers[pos] if pos < len(student_answers) else ""
+                clean_stud, stud_keywords = answer_features(stud)
+                if clean_stud and key["clean"][pos]:
+                    pairs.append((pos, stud, clean_stud, stud_keywords))
+            cohort.append(pairs)
+
+        # Embed every answerable question of the cohort in one batched call
+        flat = [pair for pairs in cohort for pair in pairs]
+        try:
+            if flat:
+                stud_emb = self.encode([clean_stud for _, _, clean_stud, _ in flat])
+                with SIMILARITY_SECONDS.time(kind="answer_key"):
+                    ref_emb = key["embeddings"][[pos for pos, _, _, _ in flat]]
+                    sims = np.einsum('ij,ij->i', stud_emb, ref_emb)
+            else:
+                sims = np.zeros(0, dtype=np.float32)
+        except Exception as e:
+            print(f"Scoring error: {str(e)}", file=sys.stderr)
+            sims = None
+
+        all_results = []
+        offset = 0
+        for pairs in cohort:
+            results = []
+            for pos, stud, clean_stud, stud_keywords in pairs:
+                clean_ref = key["clean"][pos]
+                if sims is not None:
+                    score = float(sims[offset])
+                    similarity = round(score * 100, 2)
+                    score = round(min(score * 5, 5.0), 2)
+                    topic = key["topics"][pos]
+                else:
+                    score = 0.0
+                    similarity = 0.0
+                    topic = "Scoring Error"
+                offset += 1
+
+                feedback = generate_detailed_feedback(
+                    clean_stud, clean_ref, score, topic,
+                    ref_keywords=key["keywords"][pos], stud_keywords=stud_keywords
+                )
+
+                results.append({
+                    "question": pos + 1,
+                    "score": score,
+                    "similarity": similarity,
+                    "topic": topic,
+                    "student_answer": stud,
+                    "reference_answer": reference_answers[pos],
+                    "feedback": feedback
+                })
+            all_results.append(results)
+
+        return all_results
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Return the process-wide engine, loading the model on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = EvaluationEngine()
+    return _engine
+
+def warm_up():
+    """Load the model, tokenizer data and WordNet, and run one encode"""
+    engine = get_engine()
+    engine.encode([preprocess("Warming up the evaluation models")])
+
+def evaluate(student_file, answer_key):
+    try:
+        with open(student_file, encoding="utf-8") as sf, open(answer_key, encoding="utf-8") as ak:
+            student_text = sf.read()
+            reference_text = ak.read()
+
+        results = get_engine().evaluate(student_text, reference_text)
+        print(json.dumps(results))
+
+    except Exception as e:
+        print(json.dumps({'error': str(e)}), file=sys.stderr)
+        sys.exit(1)
+
+def main():
+    try:
+        input_data = json.load(sys.stdin)
+        student_file = input_data["student_file"]
+        answer_key = input_data["answer_key"]
+        evaluate(student_file, answer_key)
+    except Exception as e:
+        print(json.dumps({'error': str(e)}), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,157 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from metrics import CACHE_LOOKUPS
+from config import EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MEMORY_ITEMS, EXTRACTION_CACHE_DISK_BYTES
+
+
+class ExtractionCache:
+    """Two-tier cache of extracted PDF text keyed by the PDF bytes and extractor.
+
+    The memory tier is a small LRU of recent documents. The disk tier keeps
+    one UTF-8 file per entry and, once the directory grows past
+    ``disk_bytes``, evicts the least recently used files down to
+    ``LOW_WATER`` of the cap. Recency and sizes of disk entries are tracked
+    in memory (seeded by one directory scan), so eviction never rescans.
+    """
+
+    LOW_WATER = 0.9
+
+    def __init__(self, root=EXTRACTION_CACHE_DIR, memory_items=EXTRACTION_CACHE_MEMORY_ITEMS,
+                 disk_bytes=EXTRACTION_CACHE_DISK_BYTES):
+        self.root = root
+        self.memory_items = memory_items
+        self.disk_bytes = disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_usage = None
+        # path -> size of every disk entry, least recently used first
+        self._disk_entries = None
+        self.counters = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(pdf_bytes, extractor, version):
+        digest = hashlib.sha256(pdf_bytes).hexdigest()
+        return hashlib.sha256(f"{extractor}:{version}:{digest}".encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.txt")
+
+    def _remember(self, key, text):
+        self._memory[key] = text
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def _scan_disk(self):
+        entries = []
+        if os.path.isdir(self.root):
+            for dirpath, _, filenames in os.walk(self.root):
+                for name in filenames:
+                    if name.endswith(".txt"):
+                        path = os.path.join(dirpath, name)
+                        stat = os.stat(path)
+                        entries.append((stat.st_mtime, stat.st_size, path))
+        return entries
+
+    def _load_disk_entries(self):
+        if self._disk_entries is None:
+            self._disk_entries = OrderedDict(
+                (path, size) for _, size, path in sorted(self._scan_disk())
+            )
+            self._disk_usage = sum(self._disk_entries.values())
+
+    def _touch(self, path, size=None):
+        """Mark a disk entry most recently used, recording its new size if given"""
+        self._load_disk_entries()
+        if size is not None:
+            self._disk_usage += size - self._disk_entries.get(path, 0)
+            self._disk_entries[path] = size
+        if path in self._disk_entries:
+            self._disk_entries.move_to_end(path)
+
+    def _evict(self):
+        """Drop least recently used files down to the low-water mark once over the cap"""
+        self._load_disk_entries()
+        if self._disk_usage <= self.disk_bytes:
+            return
+        target = self.disk_bytes * self.LOW_WATER
+        while self._disk_entries and self._disk_usage > target:
+            path, size = self._disk_entries.popitem(last=False)
+            self._disk_usage -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            self.counters["evictions"] += 1
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.counters["memory_hits"] += 1
+                return self._memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                text = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            self.counters["disk_hits"] += 1
+            self._remember(key, text)
+            self._touch(path)
+        return text
+
+    def put(self, key, text):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self._remember(key, text)
+            self._touch(path, size)
+            self._evict()
+
+    def get_or_extract(self, pdf_bytes, extractor, version, extract):
+        """Return cached text for ``pdf_bytes`` or run ``extract(pdf_bytes)`` and store it"""
+        key = self.make_key(pdf_bytes, extractor, version)
+        text = self.get(key)
+        if text is not None:
+            CACHE_LOOKUPS.inc(cache="extraction", result="hit")
+            return text
+
+        with self._lock:
+            self.counters["misses"] += 1
+        CACHE_LOOKUPS.inc(cache="extraction", result="miss")
+        text = extract(pdf_bytes)
+        self.put(key, text)
+        return text
+
+    def stats(self):
+        with self._lock:
+            self._load_disk_entries()
+            return {
+                **self.counters,
+                "memory_items": len(self._memory),
+                "disk_bytes": self._disk_usage
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_extraction_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ExtractionCache()
+    return _cache
@@ -0,0 +1,217 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from config import JOBS_DB_PATH, JOB_CONCURRENCY
+
+FINISHED = ("succeeded", "failed", "cancelled")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    progress TEXT NOT NULL DEFAULT '{}',
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+)
+"""
+
+
+class JobStore:
+    """Job records in a SQLite file, so queued and running jobs outlive the process"""
+
+    def __init__(self, path=JOBS_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SCHEMA)
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    def create(self, kind, payload):
+        job_id = uuid.uuid4().hex
+        self._execute(
+            "INSERT INTO jobs (id, kind, status, payload, created_at) VALUES (?, ?, 'queued', ?, ?)",
+            (job_id, kind, json.dumps(payload), time.time())
+        )
+        return job_id
+
+    def get(self, job_id, with_result=False):
+        columns = "*" if with_result else \
+            "id, kind, status, payload, progress, error, created_at, started_at, finished_at"
+        row = self._execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["progress"] = json.loads(job["progress"])
+        if with_result and job["result"] is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def list(self, status=None, limit=100):
+        sql = "SELECT id, kind, status, progress, error, created_at, started_at, finished_at FROM jobs"
+        params = ()
+        if status:
+            sql += " WHERE status = ?"
+            params = (status,)
+        rows = self._execute(sql + " ORDER BY created_at DESC LIMIT ?", params + (limit,)).fetchall()
+        return [dict(row, progress=json.loads(row["progress"])) for row in rows]
+
+    def start(self, job_id):
+        """Mark a queued job running; False if it was cancelled meanwhile"""
+        cursor = self._execute(
+            "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+            (time.time(), job_id)
+        )
+        return cursor.rowcount == 1
+
+    def set_progress(self, job_id, progress):
+        self._execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+
+    def finish(self, job_id, result):
+        self._execute(
+            "UPDATE jobs SET status = 'succeeded', result = ?, finished_at = ? "
+            "WHERE id = ? AND status = 'running'",
+            (json.dumps(result), time.time(), job_id)
+        )
+
+    def fail(self, job_id, error):
+        self._execute(
+            "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+            (error, time.time(), job_id)
+        )
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; False if it already finished"""
+        cursor = self._execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? "
+            "WHERE id = ? AND status IN ('queued', 'running')",
+            (time.time(), job_id)
+        )
+        return cursor.rowcount == 1
+
+    def requeue_unfinished(self):
+        """Put jobs interrupted by a shutdown back in the queue, oldest first"""
+        self._execute("UPDATE jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+        rows = self._execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at").fetchall()
+        return [row["id"] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class JobProgress:
+    """Per-job counters (e.g. files downloaded, extracted, scored), saved on every change"""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+        self.counts = {}
+
+    def set(self, **counts):
+        self.counts.update(counts)
+        self.store.set_progress(self.job_id, self.counts)
+
+    def advance(self, name, amount=1):
+        self.set(**{name: self.counts.get(name, 0) + amount})
+
+
+class JobQueue:
+    """Runs stored jobs on the event loop, at most ``concurrency`` at a time.
+
+    Handlers are ``async handler(payload, progress)`` coroutines registered
+    per job kind; their return value is stored as the job result.
+    """
+
+    def __init__(self, store, concurrency=JOB_CONCURRENCY):
+        self.store = store
+        self.concurrency = concurrency
+        self.handlers = {}
+        self._queue = None
+        self._workers = []
+        self._running = {}
+        self._stopping = False
+
+    def register(self, kind, handler):
+        self.handlers[kind] = handler
+
+    async def start(self):
+        self._stopping = False
+        self._queue = asyncio.Queue()
+        for job_id in self.store.requeue_unfinished():
+            self._queue.put_nowait(job_id)
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        """Stop the workers; interrupted jobs stay 'running' and are requeued on the next start"""
+        self._stopping = True
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def submit(self, kind, payload):
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = self.store.create(kind, payload)
+        self._queue.put_nowait(job_id)
+        return job_id
+
+    def cancel(self, job_id):
+        if not self.store.cancel(job_id):
+            return False
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return True
+
+    async def _work(self):
+        while True:
+            job_id = await self._queue.get()
+            job = self.store.get(job_id)
+            if job is None or not self.store.start(job_id):
+                continue
+
+            handler = self.handlers.get(job["kind"])
+            if handler is None:
+                self.store.fail(job_id, f"Unknown job kind: {job['kind']}")
+                continue
+
+            task = asyncio.ensure_future(handler(job["payload"], JobProgress(self.store, job_id)))
+            self._running[job_id] = task
+            try:
+                self.store.finish(job_id, await task)
+            except asyncio.CancelledError:
+                if self._stopping:
+                    raise
+            except Exception as e:
+                self.store.fail(job_id, str(getattr(e, "detail", None) or e))
+            finally:
+                self._running.pop(job_id, None)
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_job_queue():
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(JobStore())
+    return _queue
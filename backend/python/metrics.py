@@ -0,0 +1,225 @@
+"""Process-local metrics in the Prometheus text exposition format.
+
+Every metric is labelled with the endpoint that caused it. The label comes
+from the ``endpoint`` context variable, which the server sets per request
+(and per background job); the worker pool copies the context into its
+threads. Process-pool workers record into their own copy of the registry,
+which is drained after every task and merged into the server's (see
+``run_recorded``).
+"""
+import math
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+endpoint = contextvars.ContextVar("endpoint", default="none")
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        # The endpoint label always comes first and defaults to the context's
+        self.labelnames = ("endpoint",) + tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        labels.setdefault("endpoint", endpoint.get())
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        raise NotImplementedError
+
+    def drain(self):
+        """Take the recorded values, leaving the metric empty"""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values):
+        """Add values drained from another copy of this metric"""
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines += [
+            f"{name}{_format_labels(self.labelnames, values, extra)} {_format_value(value)}"
+            for name, values, extra, value in self.samples()
+        ]
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, key, (), value) for key, value in values]
+
+    def merge(self, values):
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0) + value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+                    break
+            state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the seconds the ``with`` block takes"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        samples = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key, (("le", _format_value(bound)),), cumulative))
+            samples.append((f"{self.name}_sum", key, (), total))
+            samples.append((f"{self.name}_count", key, (), cumulative))
+        return samples
+
+    def merge(self, values):
+        with self._lock:
+            for key, (counts, total) in values.items():
+                state = self._values.get(key)
+                if state is None:
+                    state = self._values[key] = [[0] * len(self.buckets), 0.0]
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Duplicate metric: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+    def drain(self):
+        """{metric name: values} recorded since the last drain, leaving every metric empty"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return {metric.name: values for metric in metrics for values in [metric.drain()] if values}
+
+    def merge(self, drained):
+        with self._lock:
+            metrics = dict(self._metrics)
+        for name, values in drained.items():
+            metrics[name].merge(values)
+
+
+REGISTRY = Registry()
+
+
+def run_recorded(label, fn):
+    """Run ``fn`` in a process-pool worker; returns (result, metrics it recorded).
+
+    The metrics are recorded under the caller's endpoint ``label``. If
+    ``fn`` raises, they travel on the exception as ``metric_deltas``.
+    """
+    token = endpoint.set(label)
+    try:
+        result = fn()
+    except BaseException as e:
+        e.metric_deltas = REGISTRY.drain()
+        raise
+    finally:
+        endpoint.reset(token)
+    return result, REGISTRY.drain()
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "smartcheck_request_seconds", "Request latency", ("status",))
+DOWNLOAD_SECONDS = REGISTRY.histogram(
+    "smartcheck_download_seconds", "Time to download one document, retries included")
+PDF_PAGE_SECONDS = REGISTRY.histogram(
+    "smartcheck_pdf_page_extraction_seconds", "Text extraction time per PDF page", ("backend",))
+TFIDF_FIT_SECONDS = REGISTRY.histogram(
+    "smartcheck_tfidf_fit_seconds", "TF-IDF vectorizer fit time")
+ENCODE_BATCH_SECONDS = REGISTRY.histogram(
+    "smartcheck_encode_batch_seconds", "Sentence-model encode latency per call")
+ENCODE_BATCH_SIZE = REGISTRY.histogram(
+    "smartcheck_encode_batch_size", "Texts per sentence-model encode call", buckets=SIZE_BUCKETS)
+SIMILARITY_SECONDS = REGISTRY.histogram(
+    "smartcheck_similarity_seconds", "Pairwise or answer-key similarity scoring time", ("kind",))
+REPORT_RENDER_SECONDS = REGISTRY.histogram(
+    "smartcheck_report_render_seconds", "Performance report HTML render time")
+
+DOCUMENTS_PROCESSED = REGISTRY.counter(
+    "smartcheck_documents_processed_total", "Documents whose text was extracted")
+CACHE_LOOKUPS = REGISTRY.counter(
+    "smartcheck_cache_lookups_total", "Cache lookups by cache and result (hit or miss)", ("cache", "result"))
+EXTRACTION_FAILURES = REGISTRY.counter(
+    "smartcheck_extraction_failures_total", "Documents whose text could not be extracted", ("reason",))
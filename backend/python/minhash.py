@@ -0,0 +1,76 @@
+import zlib
+from collections import defaultdict
+import numpy as np
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(text, size=3):
+    """Hashes of the distinct ``size``-word shingles of an already-normalized text"""
+    words = text.split()
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    hashes = {zlib.crc32(gram.encode("utf-8")) for gram in grams}
+    return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+
+class MinHasher:
+    """MinHash signatures over word shingles.
+
+    The hash family is ``((a * x + b) mod 2**64) mod p`` kept to its low 32
+    bits, with ``p`` the Mersenne prime 2**61 - 1: ``a * x + b`` wraps around
+    in uint64 arithmetic before the reduction, as in datasketch, rather than
+    being computed exactly modulo ``p``. The parameters are fixed and seeded,
+    so signatures are stable across processes and can be persisted.
+    """
+
+    def __init__(self, num_perm=128, shingle_size=3, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)
+
+    def signature(self, text):
+        hashes = shingles(text, self.shingle_size)
+        if hashes.size == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        permuted = (np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts):
+        return np.vstack([self.signature(text) for text in texts]) if texts else \
+            np.zeros((0, self.num_perm), dtype=np.uint32)
+
+
+def band_keys(signatures, bands):
+    """One bucket key per (document, band): the raw bytes of that band's rows"""
+    n, num_perm = signatures.shape
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be divisible by bands ({bands})")
+    banded = np.ascontiguousarray(signatures).reshape(n, bands, num_perm // bands)
+    return [[banded[i, b].tobytes() for b in range(bands)] for i in range(n)]
+
+
+def lsh_candidates(signatures, bands):
+    """Pairs (i, j), i < j, that share at least one identical band.
+
+    With ``r = num_perm / bands`` rows per band, a pair with Jaccard
+    similarity ``s`` becomes a candidate with probability
+    ``1 - (1 - s**r) ** bands``: more bands raise recall, more rows per band
+    cut false candidates.
+    """
+    keys = band_keys(signatures, bands)
+    candidates = set()
+    for b in range(bands):
+        buckets = defaultdict(list)
+        for i, doc_keys in enumerate(keys):
+            buckets[doc_keys[b]].append(i)
+        for members in buckets.values():
+            for x in range(len(members)):
+                for y in range(x + 1, len(members)):
+                    candidates.add((members[x], members[y]))
+    return candidates
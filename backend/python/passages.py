@@ -0,0 +1,167 @@
+import re
+import zlib
+from collections import defaultdict, Counter
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from plagiarism import preprocess_text
+
+TOKEN_RE = re.compile(r"\S+")
+
+
+class Document:
+    """Normalized words of a document with their character spans in the raw text.
+
+    Each whitespace-separated token is normalized with ``preprocess_text``,
+    as the document-level plagiarism scores are, so passages match on the
+    same words; each word keeps its raw token's ``(start, end)`` offsets.
+    """
+
+    def __init__(self, pages):
+        self.pages = list(pages)
+        self.text = "\n".join(self.pages)
+        self.page_starts = np.cumsum([0] + [len(page) + 1 for page in self.pages[:-1]])
+        self.words, starts, ends = [], [], []
+        for match in TOKEN_RE.finditer(self.text):
+            for word in preprocess_text(match.group(0)).split():
+                self.words.append(word)
+                starts.append(match.start())
+                ends.append(match.end())
+        self.starts = np.array(starts, dtype=np.int64)
+        self.ends = np.array(ends, dtype=np.int64)
+
+    def page_of(self, offset):
+        """1-based page number containing a raw character offset"""
+        return int(np.searchsorted(self.page_starts, offset, side="right"))
+
+
+def kgram_hashes(words, k):
+    """crc32 hash of every k-word shingle, indexed by its first word"""
+    if len(words) < k:
+        return np.zeros(0, dtype=np.uint32)
+    return np.fromiter(
+        (zlib.crc32(" ".join(words[i:i + k]).encode("utf-8")) for i in range(len(words) - k + 1)),
+        dtype=np.uint32, count=len(words) - k + 1
+    )
+
+
+def winnow(hashes, window):
+    """Winnowing fingerprints: the rightmost minimum hash of every window.
+
+    Any shared run of at least ``window + k - 1`` words is guaranteed to
+    produce a common fingerprint.
+    """
+    if len(hashes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    if len(hashes) <= window:
+        return np.array([len(hashes) - 1 - int(np.argmin(hashes[::-1]))], dtype=np.int64)
+    windows = sliding_window_view(hashes, window)
+    rightmost = window - 1 - np.argmin(windows[:, ::-1], axis=1)
+    return np.unique(np.arange(len(windows)) + rightmost)
+
+
+class PassageMatcher:
+    """Passage-level overlap between documents through an inverted fingerprint index"""
+
+    def __init__(self, k=5, window=4, min_words=20, max_doc_share=0.5, min_boilerplate_docs=5):
+        self.k = k
+        self.window = window
+        self.min_words = min_words
+        self.max_doc_share = max_doc_share
+        self.min_boilerplate_docs = min_boilerplate_docs
+
+    def fingerprints(self, document):
+        """(fingerprint hashes, their word positions, every distinct shingle hash)"""
+        hashes = kgram_hashes(document.words, self.k)
+        positions = winnow(hashes, self.window)
+        return hashes[positions], positions, np.unique(hashes)
+
+    def _merge(self, first, second, hits):
+        """Group matched shingle positions into contiguous (a_start, a_end, b_start, b_end) word runs"""
+        runs = []
+        for pos_a, pos_b in sorted(hits):
+            if runs:
+                a_start, a_end, b_start, b_end = runs[-1]
+                near = pos_a <= a_end + self.window and abs((pos_b - pos_a) - (b_start - a_start)) <= self.k
+                if near:
+                    runs[-1] = (a_start, max(a_end, pos_a + self.k), b_start, max(b_end, pos_b + self.k))
+                    continue
+            runs.append((pos_a, pos_a + self.k, pos_b, pos_b + self.k))
+        runs = [self._extend(first, second, run) for run in runs]
+        return [run for run in runs if run[1] - run[0] >= self.min_words]
+
+    @staticmethod
+    def _extend(first, second, run):
+        """Grow a run word by word while both documents keep agreeing"""
+        a_start, a_end, b_start, b_end = run
+        while a_start > 0 and b_start > 0 and first.words[a_start - 1] == second.words[b_start - 1]:
+            a_start, b_start = a_start - 1, b_start - 1
+        while a_end < len(first.words) and b_end < len(second.words) \
+                and first.words[a_end] == second.words[b_end]:
+            a_end, b_end = a_end + 1, b_end + 1
+        return a_start, a_end, b_start, b_end
+
+    def _span(self, document, start_word, end_word):
+        start = int(document.starts[start_word])
+        end = int(document.ends[min(end_word, len(document.words)) - 1])
+        return {
+            "start": start,
+            "end": end,
+            "pages": [document.page_of(start), document.page_of(end - 1)]
+        }
+
+    def match(self, documents, pairs=None, excerpt_chars=300):
+        """Matching passages for every document pair (or just ``pairs``) that shares text"""
+        index = defaultdict(list)
+        doc_freq = Counter()
+        for doc, document in enumerate(documents):
+            hashes, positions, shingles = self.fingerprints(document)
+            doc_freq.update(shingles.tolist())
+            for value, pos in zip(hashes.tolist(), positions.tolist()):
+                index[value].append((doc, pos))
+
+        # Shingles present in too many documents are boilerplate (e.g. question
+        # text); the floor keeps a passage copied around a small cohort reportable.
+        # Presence counts every shingle, not just the winnowed ones, since a
+        # shared shingle is not selected as a fingerprint in every document
+        max_docs = max(self.min_boilerplate_docs, int(self.max_doc_share * len(documents)))
+        wanted = set(pairs) if pairs is not None else None
+        shared = defaultdict(list)
+        for value, postings in index.items():
+            docs = {doc for doc, _ in postings}
+            if len(docs) < 2 or doc_freq[value] > max_docs:
+                continue
+            for x in range(len(postings)):
+                for y in range(x + 1, len(postings)):
+                    (doc_a, pos_a), (doc_b, pos_b) = postings[x], postings[y]
+                    if doc_a == doc_b:
+                        continue
+                    if doc_a > doc_b:
+                        doc_a, pos_a, doc_b, pos_b = doc_b, pos_b, doc_a, pos_a
+                    if wanted is None or (doc_a, doc_b) in wanted:
+                        shared[(doc_a, doc_b)].append((pos_a, pos_b))
+
+        results = []
+        for (doc_a, doc_b), hits in sorted(shared.items()):
+            first, second = documents[doc_a], documents[doc_b]
+            runs = self._merge(first, second, hits)
+            if not runs:
+                continue
+            spans = []
+            for a_start, a_end, b_start, b_end in runs:
+                span_a = self._span(first, a_start, a_end)
+                spans.append({
+                    "file1": span_a,
+                    "file2": self._span(second, b_start, b_end),
+                    "words": a_end - a_start,
+                    "excerpt": first.text[span_a["start"]:span_a["end"]][:excerpt_chars]
+                })
+            matched_words = sum(span["words"] for span in spans)
+            results.append({
+                "file1_index": doc_a,
+                "file2_index": doc_b,
+                "matched_words": matched_words,
+                "coverage1": round(min(matched_words / max(len(first.words), 1), 1.0), 4),
+                "coverage2": round(min(matched_words / max(len(second.words), 1), 1.0), 4),
+                "spans": spans
+            })
+        return results
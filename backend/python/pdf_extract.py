@@ -0,0 +1,168 @@
+import time
+import threading
+import multiprocessing
+from io import BytesIO, StringIO
+from concurrent.futures import ProcessPoolExecutor
+from PyPDF2 import PdfReader, __version__ as PYPDF2_VERSION
+from pdfminer import __version__ as PDFMINER_VERSION
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from config import PDF_MAX_BYTES, PDF_MAX_PAGES, PDF_PARALLEL_MIN_PAGES, PDF_PAGE_WORKERS
+from extraction_cache import get_extraction_cache
+from metrics import PDF_PAGE_SECONDS
+
+
+class PdfLimitError(ValueError):
+    """The PDF is larger than the configured byte or page limit"""
+
+
+# Each backend counts pages and extracts the text of pages [start, stop).
+# Page texts never contain the form feed that separates them in the cache.
+
+def _pypdf2_count(data):
+    return len(PdfReader(BytesIO(data)).pages)
+
+def _pypdf2_pages(data, start, stop):
+    reader = PdfReader(BytesIO(data))
+    for number in range(start, stop):
+        text = reader.pages[number].extract_text() or ""
+        yield text.encode("utf-8", errors="replace").decode("utf-8")
+
+def _pdfminer_count(data):
+    return sum(1 for _ in PDFPage.create_pages(PDFDocument(PDFParser(BytesIO(data)))))
+
+def _pdfminer_pages(data, start, stop):
+    # The same loop as pdfminer.high_level.extract_text, read out page by page
+    output = StringIO()
+    manager = PDFResourceManager()
+    interpreter = PDFPageInterpreter(manager, TextConverter(manager, output, laparams=LAParams()))
+    for page in PDFPage.get_pages(BytesIO(data), range(start, stop)):
+        interpreter.process_page(page)
+        text = output.getvalue()
+        output.seek(0)
+        output.truncate()
+        yield text[:-1] if text.endswith("\f") else text
+
+BACKENDS = {
+    "pypdf2": (_pypdf2_count, _pypdf2_pages, PYPDF2_VERSION),
+    "pdfminer": (_pdfminer_count, _pdfminer_pages, PDFMINER_VERSION),
+}
+
+
+def extract_page_range(backend, data, start, stop):
+    """(text, seconds) of every page in [start, stop); runs in the page pool"""
+    results = []
+    pages = BACKENDS[backend][1](data, start, stop)
+    while True:
+        began = time.perf_counter()
+        try:
+            text = next(pages)
+        except StopIteration:
+            return results
+        results.append((text, time.perf_counter() - began))
+
+
+class PageExtraction:
+    def __init__(self, backend, pages, seconds):
+        self.backend = backend
+        self.pages = pages
+        self.seconds = seconds
+
+    def timings(self):
+        return [
+            {"page": number, "chars": len(text), "seconds": round(seconds, 6)}
+            for number, (text, seconds) in enumerate(zip(self.pages, self.seconds), start=1)
+        ]
+
+
+class PdfExtractor:
+    """Page-level PDF text extraction with selectable backend and size limits.
+
+    Documents with at least ``parallel_min_pages`` pages are split into
+    contiguous page ranges parsed on a process pool; shorter ones (and all
+    documents when already inside a worker process) are parsed inline.
+    """
+
+    def __init__(self, max_bytes=PDF_MAX_BYTES, max_pages=PDF_MAX_PAGES,
+                 parallel_min_pages=PDF_PARALLEL_MIN_PAGES, workers=PDF_PAGE_WORKERS):
+        self.max_bytes = max_bytes
+        self.max_pages = max_pages
+        self.parallel_min_pages = parallel_min_pages
+        self.workers = workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def extract(self, data, backend):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown PDF backend: {backend}")
+        if self.max_bytes and len(data) > self.max_bytes:
+            raise PdfLimitError(f"PDF is {len(data)} bytes; the limit is {self.max_bytes}")
+        page_count = BACKENDS[backend][0](data)
+        if self.max_pages and page_count > self.max_pages:
+            raise PdfLimitError(f"PDF has {page_count} pages; the limit is {self.max_pages}")
+
+        parallel = (
+            self.workers > 1
+            and page_count >= self.parallel_min_pages
+            and multiprocessing.parent_process() is None
+        )
+        if parallel:
+            step = -(-page_count // self.workers)
+            futures = [
+                self._pool().submit(extract_page_range, backend, data, start, min(page_count, start + step))
+                for start in range(0, page_count, step)
+            ]
+            results = [page for future in futures for page in future.result()]
+        else:
+            results = extract_page_range(backend, data, 0, page_count)
+        for _, seconds in results:
+            PDF_PAGE_SECONDS.observe(seconds, backend=backend)
+
+        return PageExtraction(backend, [text for text, _ in results], [seconds for _, seconds in results])
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+def get_pdf_extractor():
+    global _extractor
+    with _extractor_lock:
+        if _extractor is None:
+            _extractor = PdfExtractor()
+    return _extractor
+
+def shutdown_pdf_extractor():
+    global _extractor
+    with _extractor_lock:
+        if _extractor is not None:
+            _extractor.shutdown()
+            _extractor = None
+
+
+def extract_with_timings(data, backend):
+    """Uncached PageExtraction of one document"""
+    return get_pdf_extractor().extract(data, backend)
+
+def extract_pages(data, backend):
+    """Text of every page, through the extraction cache"""
+    text = get_extraction_cache().get_or_extract(
+        data, f"{backend}-pages", BACKENDS[backend][2],
+        lambda pdf: "\f".join(extract_with_timings(pdf, backend).pages)
+    )
+    return text.split("\f")
@@ -0,0 +1,102 @@
+import re
+import string
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from minhash import MinHasher, lsh_candidates
+
+PUNCTUATION = str.maketrans('', '', string.punctuation)
+STOPWORDS = {'the', 'and', 'is', 'in', 'it', 'to', 'of', 'for'}
+DIGITS_RE = re.compile(r'\d+')
+
+
+def preprocess_text(text: str) -> str:
+    """Enhanced text preprocessing"""
+    words = [word for word in text.lower().translate(PUNCTUATION).split() if word not in STOPWORDS]
+    return DIGITS_RE.sub('', ' '.join(words)).strip()
+
+
+def cosine_matrix(vectors):
+    """Sparse document-by-document cosine similarities of the row vectors"""
+    rows = normalize(sparse.csr_matrix(vectors), norm="l2", copy=True)
+    return (rows @ rows.T).tocsr()
+
+
+def all_pairs(vectors):
+    """Every (i, j) pair with i < j and its similarity, in row-major order"""
+    n = vectors.shape[0]
+    rows, cols = np.triu_indices(n, k=1)
+    return rows, cols, cosine_matrix(vectors).toarray()[rows, cols]
+
+
+def flagged_pairs(vectors, threshold):
+    """Pairs with i < j whose similarity reaches ``threshold``, found in sparse space.
+
+    The sparse product has no entries for zero similarities, so a threshold
+    of zero or below returns every pair.
+    """
+    if threshold <= 0:
+        return all_pairs(vectors)
+    upper = sparse.triu(cosine_matrix(vectors), k=1).tocoo()
+    keep = upper.data >= threshold
+    rows, cols, sims = upper.row[keep], upper.col[keep], upper.data[keep]
+    order = np.lexsort((cols, rows))
+    return rows[order], cols[order], sims[order]
+
+
+def select_top_k(rows, cols, sims, k):
+    """Keep pairs that rank among the ``k`` most similar for either document"""
+    count = len(sims)
+    src = np.concatenate([rows, cols])
+    value = np.concatenate([sims, sims])
+    pair_id = np.concatenate([np.arange(count), np.arange(count)])
+
+    order = np.lexsort((-value, src))
+    src, pair_id = src[order], pair_id[order]
+    group_start = np.searchsorted(src, src, side="left")
+    rank = np.arange(len(src)) - group_start
+
+    keep = np.unique(pair_id[rank < k])
+    return rows[keep], cols[keep], sims[keep]
+
+
+def top_k_pairs(vectors, k):
+    """Each document's ``k`` most similar neighbours, as de-duplicated i < j pairs"""
+    upper = sparse.triu(cosine_matrix(vectors), k=1).tocoo()
+    keep = upper.data > 0
+    rows, cols, sims = upper.row[keep], upper.col[keep], upper.data[keep]
+    order = np.lexsort((cols, rows))
+    return select_top_k(rows[order], cols[order], sims[order], k)
+
+
+def candidate_pairs(vectors, candidates):
+    """Exact cosine similarity for just the given (i, j) candidate pairs"""
+    pairs = sorted(candidates)
+    rows = np.array([p[0] for p in pairs], dtype=np.int64)
+    cols = np.array([p[1] for p in pairs], dtype=np.int64)
+    if not pairs:
+        return rows, cols, np.zeros(0)
+    unit = normalize(sparse.csr_matrix(vectors), norm="l2", copy=True)
+    sims = np.asarray(unit[rows].multiply(unit[cols]).sum(axis=1)).ravel()
+    return rows, cols, sims
+
+
+def minhash_pairs(texts, vectors, num_perm=128, bands=32, shingle_size=3):
+    """Candidate pairs from MinHash/LSH over word shingles, verified with cosine"""
+    signatures = MinHasher(num_perm=num_perm, shingle_size=shingle_size).signatures(texts)
+    return candidate_pairs(vectors, lsh_candidates(signatures, bands))
+
+
+def pair_block(unit_rows, start, stop, threshold=None):
+    """Pairs (i, j), i < j, for rows ``start:stop`` of l2-normalized vectors.
+
+    Memory is bounded by the block height rather than the cohort size.
+    With a ``threshold`` only pairs reaching it are returned.
+    """
+    block = (unit_rows[start:stop] @ unit_rows.T).toarray()
+    rows, cols = np.nonzero(np.triu(np.ones_like(block, dtype=bool), k=start + 1))
+    sims = block[rows, cols]
+    if threshold is not None:
+        keep = sims >= threshold
+        rows, cols, sims = rows[keep], cols[keep], sims[keep]
+    return rows + start, cols, sims
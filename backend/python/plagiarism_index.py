@@ -0,0 +1,320 @@
+import os
+import json
+import fcntl
+import shutil
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+import numpy as np
+from scipy import sparse
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+from config import PLAGIARISM_INDEX_DIR
+
+# Raw term counts under a stateless hashing vocabulary, so stored rows never
+# need refitting when the assignment grows
+vectorizer = HashingVectorizer(n_features=2 ** 20, alternate_sign=False, norm=None)
+
+
+def presence(counts):
+    """Number of rows each column occurs in"""
+    return np.bincount(counts.indices, minlength=counts.shape[1]).astype(np.int32)
+
+
+def tfidf_rows(counts, term_df=None):
+    """TF-IDF weights of count rows with TfidfVectorizer's smoothed idf and l2 norm.
+
+    ``term_df`` gives the document frequency of each stored entry's column
+    (``counts.indices``); by default it is counted from ``counts`` itself.
+    """
+    n = counts.shape[0]
+    if term_df is None:
+        term_df = presence(counts)[counts.indices]
+    weighted = counts.copy()
+    weighted.data = counts.data * (np.log((1 + n) / (1 + term_df)) + 1)
+    return normalize(weighted, norm="l2", copy=False)
+
+
+@contextmanager
+def file_lock(path):
+    """Exclusive lock on ``path`` that also holds across worker processes.
+
+    The holder may unlink ``path``; a waiter that then acquires the
+    unlinked file retries on a fresh one.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    while True:
+        f = open(path, "a")
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            current = os.stat(path)
+        except FileNotFoundError:
+            current = None
+        if current is not None and current.st_ino == os.fstat(f.fileno()).st_ino:
+            break
+        f.close()
+    try:
+        yield
+    finally:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        f.close()
+
+
+class IndexSegment:
+    """Term counts and ids of the documents written by one ``add``"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "docs.json"), encoding="utf-8") as f:
+            self.doc_ids = json.load(f)
+        self._counts = None
+
+    @property
+    def counts(self):
+        if self._counts is None:
+            self._counts = sparse.load_npz(os.path.join(self.path, "counts.npz")).tocsr()
+        return self._counts
+
+    @classmethod
+    def write(cls, path, doc_ids, counts):
+        tmp_path = f"{path}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        sparse.save_npz(os.path.join(tmp_path, "counts.npz"), counts)
+        with open(os.path.join(tmp_path, "docs.json"), "w", encoding="utf-8") as f:
+            json.dump(list(doc_ids), f)
+        os.replace(tmp_path, path)
+        return cls(path)
+
+
+class PlagiarismIndex:
+    """Term counts of one assignment's submissions, persisted between calls.
+
+    Every ``add`` writes its documents as a new segment and applies its
+    document-frequency delta in place to ``df.npy``; earlier segments are
+    not rewritten, only marked where a document was replaced. Matching
+    weights stored rows with the stored frequencies. Runs of small
+    segments are merged once a segment is no smaller than the one before
+    it, so there are O(log n) segments and each document is rewritten
+    O(log n) times.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.manifest_path = os.path.join(path, "manifest.json")
+        self.df_path = os.path.join(path, "df.npy")
+        self.manifest = {"segments": [], "deleted": {}, "documents": 0, "next": 0}
+        self._segments = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, encoding="utf-8") as f:
+                self.manifest = json.load(f)
+
+    def segment(self, name):
+        if name not in self._segments:
+            self._segments[name] = IndexSegment(os.path.join(self.path, "segments", name))
+        return self._segments[name]
+
+    def _live_rows(self):
+        """(segment name, segment, rows still in the index) in insertion order"""
+        for name in self.manifest["segments"]:
+            segment = self.segment(name)
+            deleted = set(self.manifest["deleted"].get(name, ()))
+            yield name, segment, [i for i in range(len(segment.doc_ids)) if i not in deleted]
+
+    @property
+    def doc_ids(self):
+        return [segment.doc_ids[i] for _, segment, rows in self._live_rows() for i in rows]
+
+    def __len__(self):
+        return self.manifest["documents"]
+
+    def _split(self, doc_ids):
+        """Stored documents kept and replaced when ``doc_ids`` are (re)added"""
+        replaced = set(doc_ids)
+        kept_ids, kept, removed, removed_at = [], [], [], []
+        for name, segment, rows in self._live_rows():
+            keep = [i for i in rows if segment.doc_ids[i] not in replaced]
+            drop = [i for i in rows if segment.doc_ids[i] in replaced]
+            kept_ids += [segment.doc_ids[i] for i in keep]
+            if keep:
+                kept.append(segment.counts[keep])
+            if drop:
+                removed.append(segment.counts[drop])
+                removed_at += [(name, i) for i in drop]
+        empty = sparse.csr_matrix((0, vectorizer.n_features), dtype=np.float64)
+        kept = sparse.vstack([empty] + kept).tocsr()
+        removed = sparse.vstack([empty] + removed).tocsr()
+        return kept_ids, kept, removed, removed_at
+
+    def match(self, doc_ids, texts, threshold, top_k=None):
+        """Score new documents against the index and each other without storing them.
+
+        Returns the TF-IDF cosine matches of every new document, weighted as
+        if the index and the new documents had been vectorized together.
+        """
+        new_counts = vectorizer.transform(texts).astype(np.float64)
+        return self._match(doc_ids, new_counts, *self._split(doc_ids)[:3], threshold, top_k)
+
+    def _match(self, doc_ids, new_counts, existing_ids, kept, removed, threshold, top_k):
+        counts = sparse.vstack([kept, new_counts]).tocsr()
+        # Stored frequencies, less the replaced documents, plus the new ones
+        delta = presence(new_counts) - presence(removed)
+        term_df = delta[counts.indices]
+        if os.path.exists(self.df_path):
+            term_df += np.load(self.df_path, mmap_mode="r")[counts.indices]
+
+        weights = tfidf_rows(counts, term_df)
+        new_weights = weights[len(existing_ids):]
+        sims = (new_weights @ weights.T).toarray()
+
+        all_ids = existing_ids + list(doc_ids)
+        results = []
+        for row, doc_id in enumerate(doc_ids):
+            scores = sims[row]
+            scores[len(existing_ids) + row] = -1.0
+            order = np.argsort(-scores, kind="stable")
+            if top_k is not None:
+                order = order[:top_k]
+            matches = [
+                {
+                    "doc_id": all_ids[col],
+                    "similarity_score": round(float(scores[col]), 4),
+                    "is_plagiarised": bool(scores[col] >= threshold)
+                }
+                for col in order
+                if scores[col] >= threshold or (top_k is not None and scores[col] > 0)
+            ]
+            results.append({"doc_id": doc_id, "matches": matches})
+        return results
+
+    def add(self, doc_ids, texts, threshold, top_k=None):
+        """Match new documents, then append them (replacing any with the same id)"""
+        new_counts = vectorizer.transform(texts).astype(np.float64)
+        existing_ids, kept, removed, removed_at = self._split(doc_ids)
+        results = self._match(doc_ids, new_counts, existing_ids, kept, removed, threshold, top_k)
+
+        self._write_segment(doc_ids, new_counts)
+        for name, row in removed_at:
+            self.manifest["deleted"].setdefault(name, []).append(row)
+        self.manifest["documents"] -= len(removed_at)
+        self._apply_df(presence(new_counts) - presence(removed))
+        self._save_manifest()
+        self._merge_tail()
+        return results
+
+    def _write_segment(self, doc_ids, counts):
+        name = f"{self.manifest['next']:06d}"
+        os.makedirs(os.path.join(self.path, "segments"), exist_ok=True)
+        self._segments[name] = IndexSegment.write(os.path.join(self.path, "segments", name), doc_ids, counts)
+        self.manifest["segments"].append(name)
+        self.manifest["documents"] += len(doc_ids)
+        self.manifest["next"] += 1
+        return name
+
+    def _apply_df(self, delta):
+        """Add a document-frequency delta to df.npy, writing only the entries it changes"""
+        if os.path.exists(self.df_path):
+            df = np.load(self.df_path, mmap_mode="r+")
+        else:
+            os.makedirs(self.path, exist_ok=True)
+            df = np.lib.format.open_memmap(self.df_path, mode="w+", dtype=np.int32, shape=delta.shape)
+        changed = np.flatnonzero(delta)
+        df[changed] += delta[changed]
+        df.flush()
+        del df
+
+    def _save_manifest(self):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _merge_tail(self):
+        """Merge the last two segments while the newer holds at least as many live documents"""
+        live = {name: rows for name, _, rows in self._live_rows()}
+        while len(self.manifest["segments"]) >= 2:
+            older, newer = self.manifest["segments"][-2:]
+            if len(live[older]) > len(live[newer]):
+                break
+            parts = [(self.segment(name), live[name]) for name in (older, newer)]
+            doc_ids = [segment.doc_ids[i] for segment, rows in parts for i in rows]
+            counts = sparse.vstack([segment.counts[rows] for segment, rows in parts]).tocsr()
+
+            del self.manifest["segments"][-2:]
+            self.manifest["documents"] -= len(doc_ids)
+            merged = self._write_segment(doc_ids, counts)
+            live[merged] = list(range(len(doc_ids)))
+            for name in (older, newer):
+                self.manifest["deleted"].pop(name, None)
+            self._save_manifest()
+            for name in (older, newer):
+                self._segments.pop(name, None)
+                shutil.rmtree(os.path.join(self.path, "segments", name), ignore_errors=True)
+
+
+class PlagiarismIndexStore:
+    """One PlagiarismIndex directory per assignment under ``root``"""
+
+    def __init__(self, root=PLAGIARISM_INDEX_DIR):
+        self.root = root
+        self._locks = defaultdict(threading.Lock)
+        self._guard = threading.Lock()
+
+    def _path(self, assignment_id):
+        if not assignment_id.replace("-", "").replace("_", "").isalnum():
+            raise ValueError(f"Invalid assignment id: {assignment_id}")
+        return os.path.join(self.root, assignment_id)
+
+    @contextmanager
+    def lock(self, assignment_id):
+        """Serialize access to one assignment across threads and worker processes"""
+        path = self._path(assignment_id)
+        with self._guard:
+            thread_lock = self._locks[assignment_id]
+        with thread_lock, file_lock(f"{path}.lock"):
+            yield
+
+    def exists(self, assignment_id):
+        return os.path.isdir(self._path(assignment_id))
+
+    def open(self, assignment_id):
+        return PlagiarismIndex(self._path(assignment_id))
+
+    def add(self, assignment_id, doc_ids, texts, threshold, top_k=None):
+        with self.lock(assignment_id):
+            return self.open(assignment_id).add(doc_ids, texts, threshold, top_k)
+
+    def query(self, assignment_id, doc_ids, texts, threshold, top_k=None):
+        with self.lock(assignment_id):
+            return self.open(assignment_id).match(doc_ids, texts, threshold, top_k)
+
+    def describe(self, assignment_id):
+        with self.lock(assignment_id):
+            index = self.open(assignment_id)
+            return {"assignment_id": assignment_id, "size": len(index), "doc_ids": index.doc_ids}
+
+    def drop(self, assignment_id):
+        path = self._path(assignment_id)
+        with self.lock(assignment_id):
+            os.remove(f"{path}.lock")
+            if not os.path.isdir(path):
+                return False
+            shutil.rmtree(path)
+            return True
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_index_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PlagiarismIndexStore()
+    return _store
+
+# Picklable entry points for the worker pool; the store is resolved in the worker
+def add_to_index(assignment_id, doc_ids, texts, threshold, top_k=None):
+    return get_index_store().add(assignment_id, doc_ids, texts, threshold, top_k)
+
+def query_index(assignment_id, doc_ids, texts, threshold, top_k=None):
+    return get_index_store().query(assignment_id, doc_ids, texts, threshold, top_k)
@@ -0,0 +1,238 @@
+"""Opt-in profiling of single requests.
+
+A request sent with the ``X-Profile: 1`` header or ``?profile=1`` (only
+honoured when PROFILING is enabled) runs under cProfile and tracemalloc.
+The event-loop thread is profiled for the whole request, and every call
+the request offloads to the thread worker pool gets its own profiler (the
+pool finds the session through the copied context); their stats are merged
+into one ``.prof`` file.
+
+From Python 3.12 cProfile hooks ``sys.monitoring``, which admits one active
+profiler per interpreter instead of one per thread. That profiler then sees
+every thread, so while the loop profiler runs, worker calls are recorded by
+it; a profiler that cannot be enabled is skipped and its call runs
+unprofiled (counted as ``worker_calls_unprofiled``).
+
+Requests that do not opt in only pay one context-variable lookup per pool
+call. Other requests running concurrently on the event loop are included
+in the loop profile, and tracemalloc peaks are process-wide.
+"""
+import os
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+import tracemalloc
+import contextvars
+from config import PROFILE_DIR, PROFILE_KEEP, PROFILE_TOP
+
+session = contextvars.ContextVar("profile_session", default=None)
+
+_loop_profiling = threading.Lock()
+_tracing_lock = threading.Lock()
+_tracing = 0
+
+
+def _start_tracing():
+    global _tracing
+    with _tracing_lock:
+        if _tracing == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        _tracing += 1
+        tracemalloc.reset_peak()
+
+
+def _stop_tracing():
+    global _tracing
+    with _tracing_lock:
+        peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+        _tracing -= 1
+        if _tracing == 0 and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        return peak
+
+
+def _enable(profiler):
+    """Enable ``profiler``; False if another profiler is already active"""
+    try:
+        profiler.enable()
+    except ValueError:
+        return False
+    return True
+
+
+class ProfileSession:
+    """Profilers and memory tracing of one request"""
+
+    def __init__(self, endpoint, method, path):
+        self.id = uuid.uuid4().hex
+        self.endpoint = endpoint
+        self.method = method
+        self.path = path
+        self.started_at = time.time()
+        self.status = None
+        self._began = None
+        self._loop_profiler = None
+        self._profilers = []
+        self._unprofiled = 0
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Begin profiling on the calling (event-loop) thread"""
+        _start_tracing()
+        # Only one profiler can be active per thread
+        if _loop_profiling.acquire(blocking=False):
+            profiler = cProfile.Profile()
+            if _enable(profiler):
+                self._loop_profiler = profiler
+            else:
+                _loop_profiling.release()
+        self._began = time.perf_counter()
+
+    def run(self, call):
+        """Run ``call`` on the current worker thread under its own profiler, if one can be enabled"""
+        profiler = cProfile.Profile()
+        if not _enable(profiler):
+            with self._lock:
+                self._unprofiled += 1
+            return call()
+        with self._lock:
+            self._profilers.append(profiler)
+        try:
+            return call()
+        finally:
+            profiler.disable()
+
+    def finish(self, store):
+        wall = time.perf_counter() - self._began
+        if self._loop_profiler is not None:
+            self._loop_profiler.disable()
+            _loop_profiling.release()
+        peak = _stop_tracing()
+
+        with self._lock:
+            profilers = ([self._loop_profiler] if self._loop_profiler else []) + self._profilers
+        stats = None
+        for profiler in profilers:
+            try:
+                if stats is None:
+                    stats = pstats.Stats(profiler)
+                else:
+                    stats.add(profiler)
+            except TypeError:
+                # A profiler that recorded no calls
+                continue
+
+        return store.save(self, stats, {
+            "id": self.id,
+            "endpoint": self.endpoint,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at,
+            "wall_seconds": round(wall, 6),
+            "tracemalloc_peak_bytes": peak,
+            "event_loop_profiled": self._loop_profiler is not None,
+            "worker_calls_profiled": len(self._profilers),
+            "worker_calls_unprofiled": self._unprofiled
+        })
+
+
+def profiled(call):
+    """``call`` wrapped to run under the active session's profiler, if any"""
+    active = session.get()
+    if active is None:
+        return call
+    return lambda: active.run(call)
+
+
+def top_functions(stats, limit=PROFILE_TOP):
+    """Functions with the highest cumulative time"""
+    rows = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{filename}:{line}({name})",
+            "calls": ncalls,
+            "total_seconds": round(tottime, 6),
+            "cumulative_seconds": round(cumtime, 6)
+        })
+    rows.sort(key=lambda row: -row["cumulative_seconds"])
+    return rows[:limit]
+
+
+class ProfileStore:
+    """``<id>.prof`` (pstats) and ``<id>.json`` (summary) files, keeping the newest ``keep``"""
+
+    def __init__(self, root=PROFILE_DIR, keep=PROFILE_KEEP):
+        self.root = root
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id, suffix):
+        if not profile_id.isalnum():
+            raise ValueError(f"Invalid profile id: {profile_id}")
+        return os.path.join(self.root, f"{profile_id}{suffix}")
+
+    def save(self, profile, stats, summary):
+        os.makedirs(self.root, exist_ok=True)
+        summary["top"] = top_functions(stats) if stats is not None else []
+        if stats is not None:
+            stats.dump_stats(self._path(profile.id, ".prof"))
+        tmp_path = self._path(profile.id, ".json") + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f)
+        os.replace(tmp_path, self._path(profile.id, ".json"))
+        self._prune()
+        return summary
+
+    def _prune(self):
+        with self._lock:
+            summaries = sorted(
+                (entry for entry in os.scandir(self.root) if entry.name.endswith(".json")),
+                key=lambda entry: entry.stat().st_mtime
+            )
+            for entry in summaries[:max(0, len(summaries) - self.keep)]:
+                profile_id = entry.name[:-len(".json")]
+                for suffix in (".json", ".prof"):
+                    try:
+                        os.remove(self._path(profile_id, suffix))
+                    except FileNotFoundError:
+                        pass
+
+    def load(self, profile_id):
+        """Summary of a saved profile, or None"""
+        path = self._path(profile_id, ".json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def stats_path(self, profile_id):
+        path = self._path(profile_id, ".prof")
+        return path if os.path.exists(path) else None
+
+    def list(self, limit=100):
+        if not os.path.isdir(self.root):
+            return []
+        summaries = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".json"):
+                summary = self.load(entry.name[:-len(".json")])
+                if summary:
+                    summary.pop("top", None)
+                    summaries.append(summary)
+        summaries.sort(key=lambda summary: -summary["started_at"])
+        return summaries[:limit]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_profile_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ProfileStore()
+    return _store
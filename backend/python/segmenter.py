@@ -0,0 +1,55 @@
+import re
+
+# A block starts at a newline (not escaped by '#') followed by a question
+# marker: Q1 / Q.1 / Q 1, Question 1, 1. / 1), or [1]
+BLOCK_SPLIT_RE = re.compile(r'''
+    (?<!\#)\n
+    (?=
+        (?:Q\.?\s*\d+\b)
+        |(?:Question\s+\d+\b)
+        |(?:^\d+[\.\)]\s)
+        |(?:^\[\d+\]\s)
+    )
+''', re.VERBOSE | re.IGNORECASE | re.MULTILINE)
+
+# Blocks are kept when some line opens like a question. Leading whitespace
+# is matched within the line only, so runs of blank lines are scanned once.
+QUESTION_LINE_RE = re.compile(r'^[^\S\n]*(?:Q|\d+[.)]|\[\d+\])', re.IGNORECASE | re.MULTILINE)
+
+ANSWER_MARKER_RE = re.compile(r'answer|ans|solution', re.IGNORECASE)
+SEPARATOR_RE = re.compile(r'[\s:\-]*')
+
+
+def split_blocks(text):
+    """Stripped question blocks of an answer script"""
+    blocks = (block.strip() for block in BLOCK_SPLIT_RE.split(text))
+    return [block for block in blocks if block and QUESTION_LINE_RE.search(block)]
+
+
+def answer_of(block):
+    """Answer text after the first answer marker of a block, or "" if it has none.
+
+    The answer runs to the end of the block, after any whitespace, ':' or
+    '-' separators; at least one character is always kept, so a block
+    ending in separators answers with its last one.
+    """
+    marker = ANSWER_MARKER_RE.search(block)
+    if marker is None:
+        return ""
+    start = marker.end()
+    if start == len(block):
+        # A trailing "answer" still matches as "ans" followed by "wer"
+        if marker.group(0).lower() != "answer":
+            return ""
+        start = marker.start() + 3
+    else:
+        start = SEPARATOR_RE.match(block, start).end()
+        if start == len(block):
+            start -= 1
+    answer = block[start:].strip()
+    return '\n'.join(line.strip() for line in answer.split('\n') if line.strip())
+
+
+def segment(text):
+    """Answers of every question block in ``text``, in order"""
+    return [answer_of(block) for block in split_blocks(text)]
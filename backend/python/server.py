@@ -1,32 +1,196 @@
-import requests
-import string
+import asyncio
+import sys
+import json
+import time
 import re
 import numpy as np
 import pandas as pd
-from io import BytesIO
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, field_validator,Field
-from PyPDF2 import PdfReader
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel, field_validator, model_validator, Field, ValidationError
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.cluster import KMeans
+from sklearn.preprocessing import normalize
+from plagiarism import preprocess_text, all_pairs, flagged_pairs, top_k_pairs, minhash_pairs, select_top_k, pair_block
+from config import STREAM_BLOCK_ROWS, EVAL_STREAM_CHUNK, PLAGIARISM_PDF_BACKEND, EVAL_PDF_BACKEND, WARM_UP, PROFILING
 from collections import Counter
-from fastapi.responses import HTMLResponse
-from typing import List, Dict
-import subprocess
-import tempfile
-import os
-import json
-from pdfminer.high_level import extract_text
-import shutil
-import nltk
+from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse, PlainTextResponse, FileResponse
+from starlette.routing import Match
+from typing import List, Dict, Optional, Literal
+from evaluation import get_engine, warm_up, MODEL_NAME
+from startup import readiness
+from answer_keys import get_key_store
+from extraction_cache import get_extraction_cache
+from embedding_store import embedding_store_stats, flush_embedding_stores
+from pdf_extract import extract_pages, extract_with_timings, shutdown_pdf_extractor, PdfLimitError
+from downloader import get_downloader, close_downloader, DownloadError, DownloadTooLarge
+from plagiarism_index import get_index_store, add_to_index, query_index
+from corpus_index import get_corpus_store, add_to_corpus, query_corpus
+from passages import Document, PassageMatcher
+from workers import get_worker_pool, shutdown_worker_pool
+from jobs import get_job_queue, JobProgress
+from aggregates import (
+    get_aggregate_store, ingest_submissions, class_analysis, verify_class, rebuild_class, drop_class
+)
+from metrics import (
+    REGISTRY, endpoint as metrics_endpoint, REQUEST_SECONDS, TFIDF_FIT_SECONDS, SIMILARITY_SECONDS,
+    REPORT_RENDER_SECONDS, DOCUMENTS_PROCESSED, CACHE_LOOKUPS, EXTRACTION_FAILURES
+)
+from profiling import ProfileSession, session as profile_session, get_profile_store
+from contextlib import asynccontextmanager
+
+def job_handler(kind: str, request_model, run):
+    """Queue handler running ``run`` on a validated payload, labelled as its job kind in metrics"""
+    async def handle(payload, progress):
+        metrics_endpoint.set(f"job:{kind}")
+        return await run(request_model(**payload), progress)
+    return handle
+
+async def warm_up_workers():
+    """Warm every worker that will grade, then report the server ready"""
+    metrics_endpoint.set("warm_up")
+    began = time.perf_counter()
+    pool = get_worker_pool()
+    try:
+        # Process-pool workers each warm their own model in the pool's
+        # initializer before taking any task, so none grades cold; these
+        # tasks start the workers and wait until warm ones are serving. An
+        # initializer that failed only logs, so its error is raised again here
+        # and reported on /readyz
+        copies = pool.workers if pool.kind == "process" else 1
+        await asyncio.gather(*(pool.run(warm_up) for _ in range(copies)))
+        readiness.mark_warm(time.perf_counter() - began)
+    except Exception as e:
+        print(f"Warm-up failed: {str(e)}", file=sys.stderr)
+        readiness.mark_failed(f"Warm-up failed: {str(e)}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    missing = readiness.verify(MODEL_NAME)
+    if missing:
+        print(f"Missing bundled resources: {', '.join(missing)}", file=sys.stderr)
+    get_worker_pool(initializer=warm_up if WARM_UP else None)
+    warming = asyncio.ensure_future(warm_up_workers()) if WARM_UP else None
+    if warming is None:
+        readiness.mark_warm(0.0)
+
+    queue = get_job_queue()
+    queue.register("evaluate", job_handler("evaluate", EvaluationRequest, run_evaluation))
+    queue.register("checkPlagiarism", job_handler("checkPlagiarism", PlagiarismCheckRequest, run_plagiarism_check))
+    await queue.start()
+    yield
+    if warming is not None:
+        warming.cancel()
+    await queue.stop()
+    await close_downloader()
+    shutdown_worker_pool()
+    shutdown_pdf_extractor()
+    flush_embedding_stores()
+
+
+app = FastAPI(title="Academic Analytics API", lifespan=lifespan)
 
-# NLTK setup
-nltk.download('punkt')
-nltk.download('stopwords')
+def route_label(scope) -> str:
+    """Path template of the route a request matches, so ids do not become label values"""
+    for route in app.router.routes:
+        if route.matches(scope)[0] == Match.FULL:
+            return route.path
+    return "unmatched"
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    label = route_label(request.scope)
+    metrics_endpoint.set(label)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint=label, status=str(status))
+
+def profile_requested(request: Request) -> bool:
+    return request.headers.get("x-profile") == "1" or request.query_params.get("profile") == "1"
+
+async def profile_request(request: Request, call_next):
+    """Run opted-in requests under the profiler and point to the saved profile"""
+    if not profile_requested(request):
+        return await call_next(request)
+
+    profile = ProfileSession(route_label(request.scope), request.method, request.url.path)
+    profile_session.set(profile)
+    profile.start()
+    try:
+        response = await call_next(request)
+    except BaseException:
+        profile.finish(get_profile_store())
+        raise
+    profile.status = response.status_code
+
+    # The response body (streamed or not) is produced as it is sent
+    body = response.body_iterator
+    async def profiled_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            profile.finish(get_profile_store())
+    response.body_iterator = profiled_body()
+    response.headers["X-Profile-Id"] = profile.id
+    response.headers["X-Profile-Url"] = f"/profiles/{profile.id}"
+    return response
+
+# Registered only when enabled, so other deployments skip the extra middleware hop
+if PROFILING:
+    app.middleware("http")(profile_request)
+
+def saved_profile(profile_id: str) -> Dict:
+    if not PROFILING:
+        raise HTTPException(404, "Profiling is disabled")
+    try:
+        summary = get_profile_store().load(profile_id)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    if summary is None:
+        raise HTTPException(404, f"Unknown profile: {profile_id}")
+    return summary
 
-app = FastAPI(title="Academic Analytics API")
+@app.get("/profiles")
+async def list_profiles(limit: int = 100):
+    if not PROFILING:
+        raise HTTPException(404, "Profiling is disabled")
+    return {"profiles": get_profile_store().list(limit)}
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str):
+    """Timing, peak memory and the functions with the most cumulative time"""
+    return saved_profile(profile_id)
+
+@app.get("/profiles/{profile_id}/pstats")
+async def get_profile_stats(profile_id: str):
+    """The raw cProfile stats, for pstats or snakeviz"""
+    saved_profile(profile_id)
+    path = get_profile_store().stats_path(profile_id)
+    if path is None:
+        raise HTTPException(404, f"No stats recorded for profile: {profile_id}")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of this process's metrics"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving"""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: bundled resources verified and the model warmed up"""
+    state = readiness.describe()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
 class ResultItem(BaseModel):
     score: float = Field(..., ge=0, le=5)
     topic: str
@@ -36,13 +200,47 @@ class ResultItem(BaseModel):
 class SubmissionItem(BaseModel):
     student_name: str
     results: List[ResultItem]
+    # Lets a class's aggregates skip resent submissions; defaults to a content hash
+    submission_id: Optional[str] = None
 
 class PerformanceReportRequest(BaseModel):
     submissions: List[SubmissionItem]
+    # Fold the submissions into this class's running aggregates and report on
+    # the whole class; only new submissions need to be sent
+    class_id: Optional[str] = None
+
+class ClassSubmissionsRequest(BaseModel):
+    submissions: List[SubmissionItem]
 
 class PlagiarismCheckRequest(BaseModel):
     file_urls: List[str]
     threshold: float = 75
+    # "all" returns every pair, "flagged" only pairs above threshold,
+    # "top_k" each document's top_k most similar neighbours
+    mode: Literal["all", "flagged", "top_k"] = "all"
+    top_k: int = Field(5, ge=1)
+    # "exact" compares every pair; "minhash" only verifies LSH candidate pairs,
+    # trading recall for speed through num_perm and bands
+    strategy: Literal["exact", "minhash"] = "exact"
+    num_perm: int = Field(128, ge=8)
+    bands: int = Field(32, ge=1)
+
+    # Also match against past submissions in this corpus, optionally adding the batch
+    corpus_id: Optional[str] = None
+    add_to_corpus: bool = False
+    # Also return matched passages (character and page spans) for pairs sharing text
+    include_passages: bool = False
+    passage_min_words: int = Field(20, ge=5)
+    # Return newline-delimited JSON as documents and pairs are produced
+    stream: bool = False
+
+    @model_validator(mode="after")
+    def validate_bands(self):
+        if self.num_perm % self.bands:
+            raise ValueError("num_perm must be divisible by bands.")
+        if self.stream and (self.include_passages or self.corpus_id):
+            raise ValueError("Streaming does not support include_passages or corpus_id.")
+        return self
 
     @field_validator("threshold")
     def validate_threshold(cls, value):
@@ -50,146 +248,575 @@ class PlagiarismCheckRequest(BaseModel):
             raise ValueError("Threshold must be between 0 and 100.")
         return value
 
+class PlagiarismIndexRequest(BaseModel):
+    file_urls: List[str]
+    # Identifiers stored in the index; defaults to the file URLs
+    doc_ids: Optional[List[str]] = None
+    threshold: float = 75
+    top_k: Optional[int] = Field(None, ge=1)
+
+    @field_validator("threshold")
+    def validate_threshold(cls, value):
+        if not (0 <= value <= 100):
+            raise ValueError("Threshold must be between 0 and 100.")
+        return value
+
+    @model_validator(mode="after")
+    def validate_doc_ids(self):
+        if self.doc_ids is not None and len(self.doc_ids) != len(self.file_urls):
+            raise ValueError("doc_ids must match file_urls one to one.")
+        return self
+
+class CorpusAppendRequest(BaseModel):
+    file_urls: List[str]
+    doc_ids: Optional[List[str]] = None
+
+    @model_validator(mode="after")
+    def validate_doc_ids(self):
+        if self.doc_ids is not None and len(self.doc_ids) != len(self.file_urls):
+            raise ValueError("doc_ids must match file_urls one to one.")
+        return self
+
 class EvaluationRequest(BaseModel):
     file_urls: List[str]
+    answer_key: Optional[str] = None
+    answer_key_id: Optional[str] = None
+    # Return newline-delimited JSON, one line per graded student
+    stream: bool = False
+    # Add the graded results to this class's performance aggregates, under
+    # student_names (one per file; defaults to the file URLs)
+    class_id: Optional[str] = None
+    student_names: Optional[List[str]] = None
+
+    @model_validator(mode="after")
+    def validate_answer_key(self):
+        if bool(self.answer_key) == bool(self.answer_key_id):
+            raise ValueError("Provide exactly one of answer_key or answer_key_id.")
+        if self.student_names is not None and len(self.student_names) != len(self.file_urls):
+            raise ValueError("student_names must match file_urls one to one.")
+        return self
+
+class AnswerKeyRequest(BaseModel):
     answer_key: str
 
+class PdfExtractionRequest(BaseModel):
+    file_url: str
+    backend: Literal["pypdf2", "pdfminer"] = "pypdf2"
+    include_text: bool = False
+
+class JobRequest(BaseModel):
+    # The endpoint the job stands in for; payload is that endpoint's request body
+    kind: Literal["evaluate", "checkPlagiarism"]
+    payload: Dict
+
+def extract_pages_from_pdf(pdf_content: bytes, backend: str = PLAGIARISM_PDF_BACKEND) -> List[str]:
+    """Raw text of every page, for passage matching with page numbers"""
+    try:
+        return extract_pages(pdf_content, backend)
+    except PdfLimitError as e:
+        EXTRACTION_FAILURES.inc(reason="limit")
+        raise HTTPException(413, str(e))
+    except Exception as e:
+        EXTRACTION_FAILURES.inc(reason="error")
+        raise HTTPException(400, f"PDF processing failed: {str(e)}")
+
 def extract_text_from_pdf(pdf_content: bytes) -> str:
+    pages = extract_pages_from_pdf(pdf_content)
+    return "".join(page + "\n" for page in pages if page).strip()
+
+def extract_plagiarism_text(pdf_content: bytes) -> str:
+    text = preprocess_text(extract_text_from_pdf(pdf_content))
+    DOCUMENTS_PROCESSED.inc()
+    return text
+
+def score_pairs(texts, tfidf_matrix, threshold, mode, top_k, strategy, num_perm, bands):
+    """(rows, cols, similarities) of the pairs a plagiarism mode and strategy report"""
+    if strategy == "minhash":
+        rows, cols, sims = minhash_pairs(texts, tfidf_matrix, num_perm=num_perm, bands=bands)
+        if mode == "flagged":
+            keep = sims >= threshold
+            rows, cols, sims = rows[keep], cols[keep], sims[keep]
+        elif mode == "top_k":
+            rows, cols, sims = select_top_k(rows, cols, sims, top_k)
+    elif mode == "flagged":
+        rows, cols, sims = flagged_pairs(tfidf_matrix, threshold)
+    elif mode == "top_k":
+        rows, cols, sims = top_k_pairs(tfidf_matrix, top_k)
+    else:
+        rows, cols, sims = all_pairs(tfidf_matrix)
+    return rows, cols, sims
+
+def score_plagiarism(texts: List[str], threshold: float, mode: str = "all", top_k: int = 5,
+                     strategy: str = "exact", num_perm: int = 128, bands: int = 32) -> List[Dict]:
+    """TF-IDF vectorize the documents and score pairs against the threshold"""
+    with TFIDF_FIT_SECONDS.time():
+        tfidf_matrix = TfidfVectorizer().fit_transform(texts)
+
+    with SIMILARITY_SECONDS.time(kind="pairwise"):
+        rows, cols, sims = score_pairs(texts, tfidf_matrix, threshold, mode, top_k, strategy, num_perm, bands)
+
+    return [
+        {
+            "file1_index": int(i),
+            "file2_index": int(j),
+            "similarity_score": round(float(similarity), 4),
+            "is_plagiarised": bool(similarity >= threshold)
+        }
+        for i, j, similarity in zip(rows, cols, sims)
+    ]
+
+@app.post("/extractPdf")
+async def extract_pdf(request: PdfExtractionRequest):
+    """Uncached extraction of one PDF with per-page timings, for comparing backends"""
     try:
-        text = ""
-        with BytesIO(pdf_content) as pdf_file:
-            reader = PdfReader(pdf_file)
-            for page in reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    # Handle encoding errors here
-                    text += page_text.encode("utf-8", errors="replace").decode("utf-8") + "\n"
-        return text.strip()
+        content = await get_downloader().fetch(request.file_url)
+    except DownloadTooLarge as e:
+        raise HTTPException(413, str(e))
+    except DownloadError as e:
+        raise HTTPException(400, str(e))
+    try:
+        extraction = await get_worker_pool().run(extract_with_timings, content, request.backend)
+    except PdfLimitError as e:
+        EXTRACTION_FAILURES.inc(reason="limit")
+        raise HTTPException(413, str(e))
     except Exception as e:
+        EXTRACTION_FAILURES.inc(reason="error")
         raise HTTPException(400, f"PDF processing failed: {str(e)}")
+    DOCUMENTS_PROCESSED.inc()
+
+    response = {
+        "backend": extraction.backend,
+        "seconds": round(sum(extraction.seconds), 6),
+        "pages": extraction.timings()
+    }
+    if request.include_text:
+        for page, text in zip(response["pages"], extraction.pages):
+            page["text"] = text
+    return response
+
+@app.get("/extractionCache/stats")
+async def extraction_cache_stats():
+    return get_extraction_cache().stats()
+
+@app.get("/embeddingStore/stats")
+async def embedding_store_stats_endpoint():
+    """Size, codec and measured cosine error of the embedding stores in this process"""
+    return embedding_store_stats()
+
+def counter(progress: Optional[JobProgress], name: str, skip=()):
+    """Callback advancing one job progress counter per item (not for ``skip`` items); None outside jobs"""
+    if progress is None:
+        return None
+    return lambda item: item in skip or progress.advance(name)
+
+async def fetch_plagiarism_texts(file_urls: List[str], progress: Optional[JobProgress] = None):
+    """Download and preprocess submissions for plagiarism scoring.
+
+    Returns the raw PDF bytes alongside the preprocessed texts.
+    """
+    try:
+        contents = await get_downloader().fetch_all(file_urls, on_fetched=counter(progress, "downloaded"))
+    except DownloadTooLarge as e:
+        raise HTTPException(413, str(e))
+    except DownloadError as e:
+        raise HTTPException(400, str(e))
+
+    texts = await get_worker_pool().map(
+        extract_plagiarism_text, contents, on_done=counter(progress, "extracted")
+    )
+    for url, processed_text in zip(file_urls, texts):
+        if not processed_text:
+            EXTRACTION_FAILURES.inc(reason="empty")
+            raise HTTPException(400, f"No meaningful text from {url}")
+    return contents, texts
+
+def ndjson(record: Dict) -> bytes:
+    return (json.dumps(record) + "\n").encode("utf-8")
+
+async def fetch_and_extract(index: int, url: str, extractor):
+    """Download and extract one document, reporting failures instead of raising"""
+    try:
+        content = await get_downloader().fetch(url)
+        return index, await get_worker_pool().run(extractor, content), None
+    except HTTPException as e:
+        return index, None, e.detail
+    except Exception as e:
+        return index, None, str(e)
+
+def tfidf_unit_rows(texts: List[str]):
+    with TFIDF_FIT_SECONDS.time():
+        return normalize(TfidfVectorizer().fit_transform(texts), norm="l2", copy=False)
+
+def timed_pair_block(unit, start, stop, threshold):
+    with SIMILARITY_SECONDS.time(kind="pairwise"):
+        return pair_block(unit, start, stop, threshold)
+
+async def stream_plagiarism(request_data: PlagiarismCheckRequest):
+    """Yield document statuses as they finish, then pairs, then a summary"""
+    pool = get_worker_pool()
+    threshold = request_data.threshold / 100
+
+    tasks = [
+        asyncio.ensure_future(fetch_and_extract(i, url, extract_plagiarism_text))
+        for i, url in enumerate(request_data.file_urls)
+    ]
+    texts = {}
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            index, text, error = await next_done
+            if error is None and not text:
+                EXTRACTION_FAILURES.inc(reason="empty")
+                error = "No meaningful text"
+            if error is None:
+                texts[index] = text
+            yield ndjson({
+                "type": "document",
+                "file_index": index,
+                "file_url": request_data.file_urls[index],
+                "status": "ok" if error is None else "error",
+                **({"error": error} if error else {})
+            })
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    indices = sorted(texts)
+    valid = [texts[i] for i in indices]
+    pairs = 0
+
+    def pair_record(i, j, similarity):
+        return ndjson({
+            "type": "pair",
+            "file1_index": indices[i],
+            "file2_index": indices[j],
+            "similarity_score": round(float(similarity), 4),
+            "is_plagiarised": bool(similarity >= threshold)
+        })
+
+    if len(valid) >= 2:
+        if request_data.strategy == "exact" and request_data.mode in ("all", "flagged"):
+            # Score one block of rows at a time so memory stays bounded
+            unit = await pool.run(tfidf_unit_rows, valid)
+            block_threshold = threshold if request_data.mode == "flagged" else None
+            for start in range(0, len(valid), STREAM_BLOCK_ROWS):
+                stop = min(len(valid), start + STREAM_BLOCK_ROWS)
+                rows, cols, sims = await pool.run(timed_pair_block, unit, start, stop, block_threshold)
+                for i, j, similarity in zip(rows, cols, sims):
+                    pairs += 1
+                    yield pair_record(i, j, similarity)
+        else:
+            results = await pool.run(
+                score_plagiarism, valid, threshold, request_data.mode, request_data.top_k,
+                request_data.strategy, request_data.num_perm, request_data.bands
+            )
+            for result in results:
+                pairs += 1
+                yield pair_record(result["file1_index"], result["file2_index"], result["similarity_score"])
+
+    yield ndjson({
+        "type": "summary",
+        "documents": len(request_data.file_urls),
+        "failed": len(request_data.file_urls) - len(valid),
+        "pairs": pairs
+    })
+
+def match_passages(pages_per_doc: List[List[str]], min_words: int) -> List[Dict]:
+    documents = [Document(pages) for pages in pages_per_doc]
+    return PassageMatcher(min_words=min_words).match(documents)
+
+async def run_plagiarism_check(request_data: PlagiarismCheckRequest, progress: Optional[JobProgress] = None) -> Dict:
+    if progress:
+        progress.set(total=len(request_data.file_urls), downloaded=0, extracted=0, scored=0)
+    contents, texts = await fetch_plagiarism_texts(request_data.file_urls, progress)
+
+    pool = get_worker_pool()
+    threshold = request_data.threshold / 100
+    results = await pool.run(
+        score_plagiarism, texts, threshold, request_data.mode, request_data.top_k,
+        request_data.strategy, request_data.num_perm, request_data.bands
+    )
+    if progress:
+        progress.set(scored=len(texts))
 
-def preprocess_text(text: str) -> str:
-    """Enhanced text preprocessing"""
-    text = text.lower().translate(str.maketrans('', '', string.punctuation))
-    stopwords = set(['the', 'and', 'is', 'in', 'it', 'to', 'of', 'for'])
-    words = [word for word in text.split() if word not in stopwords]
-    return re.sub(r'\d+', '', ' '.join(words)).strip()
+    response = {"results": results}
+
+    if request_data.include_passages:
+        pages = await pool.map(extract_pages_from_pdf, contents)
+        response["passages"] = await pool.run(match_passages, pages, request_data.passage_min_words)
+
+    if request_data.corpus_id:
+        # Score the batch against past submissions before it joins the corpus
+        corpus_matches = []
+        if get_corpus_store().exists(request_data.corpus_id):
+            matches = await pool.run(query_corpus, request_data.corpus_id, texts, threshold)
+            corpus_matches = [
+                {"file_index": i, "matches": found} for i, found in enumerate(matches) if found
+            ]
+        if request_data.add_to_corpus:
+            await pool.run(add_to_corpus, request_data.corpus_id, request_data.file_urls, texts)
+        response["corpus_matches"] = corpus_matches
+
+    return response
 
 @app.post("/checkPlagiarism")
 async def check_plagiarism_endpoint(request_data: PlagiarismCheckRequest):
     """Improved plagiarism detection endpoint"""
     try:
-        texts = []
-        for url in request_data.file_urls:
-            try:
-                response = requests.get(url, timeout=10)
-                response.raise_for_status()
-                raw_text = extract_text_from_pdf(response.content)
-                processed_text = preprocess_text(raw_text)
-                
-                if not processed_text:
-                    raise HTTPException(400, f"No meaningful text from {url}")
-                texts.append(processed_text)
-                
-            except requests.exceptions.RequestException as e:
-                raise HTTPException(400, f"Failed to download {url}: {str(e)}")
-
-        vectorizer = TfidfVectorizer()
-        tfidf_matrix = vectorizer.fit_transform(texts)
-        
-        threshold = request_data.threshold / 100
-        results = []
-        
-        for i in range(len(texts)):
-            for j in range(i + 1, len(texts)):
-                similarity = cosine_similarity(
-                    tfidf_matrix[i:i+1], 
-                    tfidf_matrix[j:j+1]
-                )[0][0]
-                
-                results.append({
-                    "file1_index": i,
-                    "file2_index": j,
-                    "similarity_score": round(float(similarity), 4),  
-                    "is_plagiarised": bool(similarity >= threshold)
-                })
-        
+        if request_data.stream:
+            return StreamingResponse(stream_plagiarism(request_data), media_type="application/x-ndjson")
+        return await run_plagiarism_check(request_data)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        raise HTTPException(500, f"Internal error: {str(e)}")
+
+@app.post("/corpus/{corpus_id}")
+async def append_to_corpus(corpus_id: str, request_data: CorpusAppendRequest):
+    """Add submissions to a historical corpus that later checks are scored against"""
+    try:
+        contents, texts = await fetch_plagiarism_texts(request_data.file_urls)
+        doc_ids = request_data.doc_ids or request_data.file_urls
+        return await get_worker_pool().run(add_to_corpus, corpus_id, doc_ids, texts)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    except Exception as e:
+        raise HTTPException(500, f"Internal error: {str(e)}")
+
+@app.get("/corpus/{corpus_id}")
+async def describe_corpus(corpus_id: str):
+    try:
+        store = get_corpus_store()
+        if not store.exists(corpus_id):
+            raise HTTPException(404, f"No corpus named {corpus_id}")
+        return store.open(corpus_id).describe()
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+async def _run_index_request(assignment_id: str, request_data: PlagiarismIndexRequest, add: bool):
+    try:
+        contents, texts = await fetch_plagiarism_texts(request_data.file_urls)
+        doc_ids = request_data.doc_ids or request_data.file_urls
+        run = add_to_index if add else query_index
+        results = await get_worker_pool().run(
+            run, assignment_id, doc_ids, texts, request_data.threshold / 100, request_data.top_k
+        )
         return {"results": results}
 
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(400, str(e))
     except Exception as e:
         raise HTTPException(500, f"Internal error: {str(e)}")
 
-@app.post("/evaluate")
-async def evaluate_submissions(request: EvaluationRequest):
+@app.post("/plagiarismIndex/{assignment_id}")
+async def add_to_plagiarism_index(assignment_id: str, request_data: PlagiarismIndexRequest):
+    """Match new submissions against an assignment's stored index, then add them"""
+    return await _run_index_request(assignment_id, request_data, add=True)
+
+@app.post("/plagiarismIndex/{assignment_id}/query")
+async def query_plagiarism_index(assignment_id: str, request_data: PlagiarismIndexRequest):
+    """Match submissions against an assignment's stored index without adding them"""
+    return await _run_index_request(assignment_id, request_data, add=False)
+
+@app.get("/plagiarismIndex/{assignment_id}")
+async def describe_plagiarism_index(assignment_id: str):
+    try:
+        store = get_index_store()
+        if not store.exists(assignment_id):
+            raise HTTPException(404, f"No plagiarism index for {assignment_id}")
+        return store.describe(assignment_id)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+@app.delete("/plagiarismIndex/{assignment_id}")
+async def drop_plagiarism_index(assignment_id: str):
     try:
-        temp_dir = tempfile.mkdtemp()
-        student_text_path = os.path.join(temp_dir, "student_answers.txt")
-        answer_key_path = os.path.join(temp_dir, "answer_key.txt")
-
-        # Download and extract text from student PDFs
-        all_student_answers = []
-        for url in request.file_urls:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-
-            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_pdf:
-                for chunk in response.iter_content(chunk_size=8192):
-                    temp_pdf.write(chunk)
-
-            text = extract_text(temp_pdf.name)
-            answers = [line.strip() for line in text.strip().splitlines() if line.strip()]
-            all_student_answers.append(answers)
-            os.unlink(temp_pdf.name)
-
-        # Flatten student answers and write to file
-        with open(student_text_path, "w",encoding="utf-8") as f:
-            for line in all_student_answers[0]:  # Only evaluating the first student
-                f.write(line + "\n")
-
-        # Download and extract text from answer key
-        response = requests.get(request.answer_key, stream=True)
-        response.raise_for_status()
-
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as temp_pdf:
-            for chunk in response.iter_content(chunk_size=8192):
-                temp_pdf.write(chunk)
-
-        answer_key_text = extract_text(temp_pdf.name)
-        os.unlink(temp_pdf.name)
-
-        with open(answer_key_path, "w", encoding="utf-8") as f:
-            for line in answer_key_text.strip().splitlines():
-                if line.strip():
-                    f.write(line.strip() + "\n")
-
-        # Call evaluation.py via subprocess
-        result = subprocess.run(
-            ["python", "evaluation.py"],
-            input=json.dumps({
-                "student_file": student_text_path,
-                "answer_key": answer_key_path
-            }),
-            capture_output=True,
-            text=True,
-            encoding="utf-8",
-            env={**os.environ, "PYTHONUTF8": "1"} 
+        if not get_index_store().drop(assignment_id):
+            raise HTTPException(404, f"No plagiarism index for {assignment_id}")
+        return {"dropped": assignment_id}
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+def extract_lines_from_pdf(pdf_content: bytes) -> str:
+    """Return the non-empty lines of a PDF, one per line"""
+    text = "\n".join(extract_pages_from_pdf(pdf_content, EVAL_PDF_BACKEND))
+    DOCUMENTS_PROCESSED.inc()
+    return "".join(line.strip() + "\n" for line in text.strip().splitlines() if line.strip())
+
+def compile_answer_key(reference_text: str) -> str:
+    """Compile and persist an answer key, returning its key id"""
+    engine = get_engine()
+    store = get_key_store()
+    key_id = store.key_id_for(reference_text, engine.model_id)
+    cached = store.exists(key_id)
+    CACHE_LOOKUPS.inc(cache="answer_key", result="hit" if cached else "miss")
+    if not cached:
+        store.save(key_id, engine.compile_key(reference_text), engine.model_id)
+    return key_id
+
+def grade_cohort(student_texts: List[str], key: Dict) -> List[List[Dict]]:
+    return get_engine().evaluate_many(student_texts, key)
+
+@app.post("/answerKeys")
+async def ingest_answer_key(request: AnswerKeyRequest):
+    """Ingest an answer key PDF once and return an id /evaluate can grade against"""
+    try:
+        content = await get_downloader().fetch(request.answer_key)
+        pool = get_worker_pool()
+        key_id = await pool.run(compile_answer_key, await pool.run(extract_lines_from_pdf, content))
+        compiled = get_key_store().load(key_id)
+        return {"key_id": key_id, "questions": len(compiled["answers"]), "topics": compiled["topics"]}
+
+    except DownloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except DownloadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/answerKeys/{key_id}")
+async def get_answer_key(key_id: str):
+    try:
+        compiled = get_key_store().load(key_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if compiled is None:
+        raise HTTPException(status_code=404, detail=f"Unknown answer key: {key_id}")
+    return {"key_id": key_id, "questions": len(compiled["answers"]), "topics": compiled["topics"]}
+
+async def resolve_answer_key(request: EvaluationRequest, content: Optional[bytes] = None) -> Dict:
+    """Load the compiled key by id, or download (unless given) and compile it from its URL"""
+    if request.answer_key_id:
+        key = get_key_store().load(request.answer_key_id)
+        if key is None:
+            raise HTTPException(status_code=404, detail=f"Unknown answer key: {request.answer_key_id}")
+        return key
+
+    if content is None:
+        try:
+            content = await get_downloader().fetch(request.answer_key)
+        except DownloadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        except DownloadError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    pool = get_worker_pool()
+    reference_text = await pool.run(extract_lines_from_pdf, content)
+    return get_key_store().load(await pool.run(compile_answer_key, reference_text))
+
+def class_submissions(names: List[str], results: List[List[Dict]]) -> List[Dict]:
+    return [{"student_name": name, "results": result} for name, result in zip(names, results)]
+
+async def record_class_results(request: EvaluationRequest, indices: List[int], results: List[List[Dict]]):
+    """Add graded students to the request's class aggregates, if it names a class"""
+    if not request.class_id or not results:
+        return
+    names = request.student_names or request.file_urls
+    submissions = class_submissions([names[i] for i in indices], results)
+    await get_worker_pool().run(ingest_submissions, request.class_id, submissions)
+
+async def stream_evaluation(request: EvaluationRequest, key: Dict):
+    """Grade students chunk by chunk, yielding one line per student as it is scored"""
+    file_urls = request.file_urls
+    pool = get_worker_pool()
+
+    def fetch_chunk(start):
+        chunk = file_urls[start:start + EVAL_STREAM_CHUNK]
+        return asyncio.ensure_future(asyncio.gather(*(
+            fetch_and_extract(start + i, url, extract_lines_from_pdf) for i, url in enumerate(chunk)
+        )))
+
+    graded = failed = 0
+    pending = fetch_chunk(0) if file_urls else None
+    try:
+        for start in range(0, len(file_urls), EVAL_STREAM_CHUNK):
+            fetched = await pending
+            # Download the next chunk while this one is graded
+            nxt = start + EVAL_STREAM_CHUNK
+            pending = fetch_chunk(nxt) if nxt < len(file_urls) else None
+
+            ok = [(index, text) for index, text, error in fetched if error is None]
+            for index, _, error in fetched:
+                if error is not None:
+                    failed += 1
+                    yield ndjson({"type": "error", "file_url": file_urls[index], "error": error})
+
+            results = await pool.run(grade_cohort, [text for _, text in ok], key)
+            await record_class_results(request, [index for index, _ in ok], results)
+            for (index, _), result in zip(ok, results):
+                graded += 1
+                yield ndjson({"type": "result", "file_url": file_urls[index], "results": result})
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+    yield ndjson({"type": "summary", "graded": graded, "failed": failed})
+
+async def run_evaluation(request: EvaluationRequest, progress: Optional[JobProgress] = None) -> Dict:
+    # Download the answer key (if given by URL) and every student PDF concurrently
+    key_urls = [] if request.answer_key_id else [request.answer_key]
+    if progress:
+        progress.set(total=len(request.file_urls), downloaded=0, extracted=0, scored=0)
+    try:
+        contents = await get_downloader().fetch_all(
+            key_urls + request.file_urls, on_fetched=counter(progress, "downloaded", skip=key_urls)
         )
+    except DownloadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except DownloadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pool = get_worker_pool()
+    key = await resolve_answer_key(request, contents[0] if key_urls else None)
 
-        shutil.rmtree(temp_dir)
+    student_texts = await pool.map(
+        extract_lines_from_pdf, contents[len(key_urls):], on_done=counter(progress, "extracted")
+    )
+    # The raw PDFs are not needed for grading
+    del contents
 
-        if result.returncode != 0:
-            raise HTTPException(status_code=500, detail=result.stderr)
+    # Score the whole cohort against one compiled answer key; jobs grade in
+    # chunks so progress moves while a large cohort is scored
+    if progress is None:
+        results = await pool.run(grade_cohort, student_texts, key)
+    else:
+        results = []
+        for start in range(0, len(student_texts), EVAL_STREAM_CHUNK):
+            results += await pool.run(grade_cohort, student_texts[start:start + EVAL_STREAM_CHUNK], key)
+            progress.set(scored=len(results))
+    await record_class_results(request, list(range(len(results))), results)
 
-        return {"results": json.loads(result.stdout)}
+    # One entry per file_urls entry, in request order (a URL may repeat)
+    return {"results": results}
+
+@app.post("/evaluate")
+async def evaluate_submissions(request: EvaluationRequest):
+    try:
+        if request.class_id:
+            get_aggregate_store().check_class_id(request.class_id)
+        if request.stream:
+            key = await resolve_answer_key(request)
+            return StreamingResponse(stream_evaluation(request, key), media_type="application/x-ndjson")
+        return await run_evaluation(request)
 
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 class ClassPerformanceAnalyzer:
     def __init__(self):
+        from sklearn.cluster import KMeans
+
         self.vectorizer = TfidfVectorizer(stop_words='english', max_features=5000)
         self.cluster_model = KMeans(n_clusters=5, random_state=42)
     def create_dataframe(self, submissions):
@@ -639,6 +1266,28 @@ class ClassPerformanceAnalyzer:
 </html>
         """
 
+def build_performance_report(submissions_data: List[Dict]) -> Optional[str]:
+    """Analyze the submissions and render the HTML report, or None without usable data"""
+    analyzer = ClassPerformanceAnalyzer()
+    df = analyzer.create_dataframe(submissions_data)
+    
+    if df.empty:
+        return None
+    
+    return render_performance_report(analyzer.analyze_class_performance(df))
+
+def render_performance_report(analysis: Dict) -> str:
+    with REPORT_RENDER_SECONDS.time():
+        return ClassPerformanceAnalyzer().generate_html_report(analysis)
+
+def build_class_report(class_id: str, submissions_data: List[Dict]) -> Optional[str]:
+    """Add new submissions to a class's aggregates and render the report of the whole class"""
+    store = get_aggregate_store()
+    if submissions_data:
+        store.ingest(class_id, submissions_data)
+    analysis = store.analysis(class_id)
+    return render_performance_report(analysis) if analysis else None
+
 @app.post("/generatePerformanceReport", response_class=HTMLResponse)
 async def generate_performance_report(request_data: PerformanceReportRequest):
     """Generate comprehensive class performance report"""
@@ -646,26 +1295,132 @@ async def generate_performance_report(request_data: PerformanceReportRequest):
         # Convert Pydantic model to dict for processing
         submissions_data = [sub.dict() for sub in request_data.submissions]
         
-        analyzer = ClassPerformanceAnalyzer()
-        df = analyzer.create_dataframe(submissions_data)
+        if request_data.class_id:
+            html = await get_worker_pool().run(build_class_report, request_data.class_id, submissions_data)
+        else:
+            html = await get_worker_pool().run(build_performance_report, submissions_data)
         
-        if df.empty:
+        if html is None:
             raise HTTPException(
                 status_code=400,
                 detail="No valid data to analyze - check your input structure"
             )
         
-        analysis = analyzer.analyze_class_performance(df)
-        return HTMLResponse(content=analyzer.generate_html_report(analysis), headers={"Content-Type": "text/html; charset=utf-8"})
+        return HTMLResponse(content=html, headers={"Content-Type": "text/html; charset=utf-8"})
 
     except HTTPException:
         raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Report generation failed: {str(e)}"
         )
 
+def json_safe(value):
+    """NaN (a standard deviation of fewer than two scores) as null"""
+    if isinstance(value, dict):
+        return {key: json_safe(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [json_safe(item) for item in value]
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+async def run_class_aggregates(method, class_id: str, *args):
+    try:
+        return await get_worker_pool().run(method, class_id, *args)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/classes/{class_id}/submissions")
+async def add_class_submissions(class_id: str, request_data: ClassSubmissionsRequest):
+    """Fold graded submissions into a class's running aggregates"""
+    submissions_data = [sub.model_dump() for sub in request_data.submissions]
+    ingested, skipped = await run_class_aggregates(ingest_submissions, class_id, submissions_data)
+    return {"class_id": class_id, "ingested": ingested, "skipped": skipped}
+
+@app.get("/classes/{class_id}/aggregates")
+async def get_class_aggregates(class_id: str):
+    analysis = await run_class_aggregates(class_analysis, class_id)
+    if analysis is None:
+        raise HTTPException(status_code=404, detail=f"No submissions for class {class_id}")
+    return json_safe(analysis)
+
+@app.get("/classes/{class_id}/report", response_class=HTMLResponse)
+async def get_class_report(class_id: str):
+    """Performance report of a class, rendered from its aggregates"""
+    html = await run_class_aggregates(build_class_report, class_id, [])
+    if html is None:
+        raise HTTPException(status_code=404, detail=f"No submissions for class {class_id}")
+    return HTMLResponse(content=html, headers={"Content-Type": "text/html; charset=utf-8"})
+
+@app.get("/classes/{class_id}/verify")
+async def verify_class_aggregates(class_id: str):
+    """Recompute a class's aggregates from its stored answers and report any drift"""
+    return json_safe(await run_class_aggregates(verify_class, class_id))
+
+@app.post("/classes/{class_id}/rebuild")
+async def rebuild_class_aggregates(class_id: str):
+    """Replace a class's aggregates with ones recomputed from its stored answers"""
+    answers = await run_class_aggregates(rebuild_class, class_id)
+    return {"class_id": class_id, "answers": answers}
+
+@app.delete("/classes/{class_id}")
+async def drop_class_aggregates(class_id: str):
+    await run_class_aggregates(drop_class, class_id)
+    return {"dropped": class_id}
+
+JOB_REQUESTS = {"evaluate": EvaluationRequest, "checkPlagiarism": PlagiarismCheckRequest}
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest):
+    """Queue an /evaluate or /checkPlagiarism run and return its job id at once"""
+    try:
+        body = JOB_REQUESTS[request.kind](**request.payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if getattr(body, "stream", False):
+        raise HTTPException(status_code=400, detail="Jobs cannot stream their results.")
+
+    job_id = get_job_queue().submit(request.kind, body.model_dump())
+    return {"job_id": job_id, "status": "queued"}
+
+@app.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 100):
+    return {"jobs": get_job_queue().store.list(status, limit)}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = get_job_queue().store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    job.pop("payload")
+    return job
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = get_job_queue().store.get(job_id, with_result=True)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if job["status"] != "succeeded":
+        detail = f"Job is {job['status']}"
+        if job["error"]:
+            detail += f": {job['error']}"
+        raise HTTPException(status_code=409, detail=detail)
+    return job["result"]
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    queue = get_job_queue()
+    job = queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    if not queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+    return {"job_id": job_id, "status": "cancelled"}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
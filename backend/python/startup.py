@@ -0,0 +1,138 @@
+"""Offline start-up: bundled NLTK data and model weights, warm-up and readiness.
+
+Nothing here touches the network except ``python -m startup --bundle``,
+which is meant for image builds and fills NLTK_DATA_DIR and MODEL_DIR.
+"""
+import os
+import sys
+import time
+import threading
+import nltk
+from config import NLTK_DATA_DIR, MODEL_DIR, OFFLINE, EVAL_MODEL_NAME, EMBEDDING_BACKEND
+from embedding_backends import onnx_file, export_backend
+
+# Any one of the paths in each entry satisfies the resource
+NLTK_RESOURCES = {
+    # nltk 3.8.1's word_tokenize loads the pickled punkt models, not punkt_tab
+    "punkt": ("tokenizers/punkt",),
+    "stopwords": ("corpora/stopwords",),
+    "wordnet": ("corpora/wordnet", "corpora/wordnet.zip"),
+}
+MODEL_FILES = ("modules.json", "config.json")
+WEIGHT_FILES = ("model.safetensors", "pytorch_model.bin")
+
+
+def use_local_resources():
+    """Search the bundled NLTK data first and keep Hugging Face libraries offline"""
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+    if OFFLINE:
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+
+
+def missing_nltk_data(names=tuple(NLTK_RESOURCES)):
+    missing = []
+    for name in names:
+        for path in NLTK_RESOURCES[name]:
+            try:
+                nltk.data.find(path)
+                break
+            except LookupError:
+                continue
+        else:
+            missing.append(name)
+    return missing
+
+
+def model_source(model_name):
+    """Bundled model directory if present, else the name (resolved from the local HF cache)"""
+    path = os.path.join(MODEL_DIR, model_name)
+    return path if os.path.isdir(path) else model_name
+
+
+def model_files_present(model_name, backend=EMBEDDING_BACKEND):
+    source = model_source(model_name)
+    if os.path.isdir(source):
+        if backend != "torch":
+            return os.path.exists(os.path.join(source, onnx_file(backend)))
+        return all(os.path.exists(os.path.join(source, f)) for f in MODEL_FILES) and \
+            any(os.path.exists(os.path.join(source, f)) for f in WEIGHT_FILES)
+
+    from huggingface_hub import try_to_load_from_cache
+    repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+    return isinstance(try_to_load_from_cache(repo, "modules.json"), str)
+
+
+class Readiness:
+    """Start-up checks and warm-up state behind /healthz and /readyz"""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.missing = []
+        self.warm = False
+        self.warm_seconds = None
+        self.error = None
+        self._lock = threading.Lock()
+
+    def verify(self, model_name):
+        missing = [f"nltk:{name}" for name in missing_nltk_data()]
+        if not model_files_present(model_name):
+            missing.append(f"model:{model_name}")
+        with self._lock:
+            self.missing = missing
+        return missing
+
+    def mark_warm(self, seconds):
+        with self._lock:
+            self.warm = True
+            self.warm_seconds = round(seconds, 3)
+
+    def mark_failed(self, error):
+        with self._lock:
+            self.error = error
+
+    @property
+    def ready(self):
+        return self.warm and not self.missing and self.error is None
+
+    def describe(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "warm": self.warm,
+                "warm_seconds": self.warm_seconds,
+                "missing": list(self.missing),
+                "error": self.error,
+                "uptime_seconds": round(time.time() - self.started_at, 3)
+            }
+
+
+readiness = Readiness()
+
+
+def bundle(model_name):
+    """Download NLTK data and model weights into the bundle directories (build time only)"""
+    os.makedirs(NLTK_DATA_DIR, exist_ok=True)
+    for name in ("punkt", "stopwords", "wordnet"):
+        nltk.download(name, download_dir=NLTK_DATA_DIR, quiet=True)
+
+    from sentence_transformers import SentenceTransformer
+    target = os.path.join(MODEL_DIR, model_name)
+    SentenceTransformer(model_name).save(target)
+    export_backend(target, EMBEDDING_BACKEND, target)
+
+
+def main():
+    if "--bundle" in sys.argv:
+        bundle(EVAL_MODEL_NAME)
+    use_local_resources()
+    missing = Readiness().verify(EVAL_MODEL_NAME)
+    if missing:
+        print(f"Missing bundled resources: {', '.join(missing)}", file=sys.stderr)
+        sys.exit(1)
+    print("All bundled resources present")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import asyncio
+from collections import Counter, defaultdict
+
+import httpx
+import pytest
+
+from downloader import Downloader, DownloadError, DownloadTooLarge
+
+
+def fetch_all(handler, urls, **kwargs):
+    """Run Downloader.fetch_all with requests answered by ``handler``"""
+    async def run():
+        downloader = Downloader(backoff=0, **kwargs)
+        await downloader.aclose()
+        downloader.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        try:
+            return await downloader.fetch_all(urls)
+        finally:
+            await downloader.aclose()
+
+    return asyncio.run(run())
+
+
+def test_requests_per_host_never_exceed_the_cap():
+    active, peak = Counter(), Counter()
+
+    async def handler(request):
+        host = request.url.host
+        active[host] += 1
+        peak[host] = max(peak[host], active[host])
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        return httpx.Response(200, content=request.url.path.encode())
+
+    urls = [f"http://{host}/{i}" for host in ("a.test", "b.test") for i in range(10)]
+    bodies = fetch_all(handler, urls, per_host=3)
+    assert bodies == [url.split(".test")[1].encode() for url in urls]
+    assert peak == {"a.test": 3, "b.test": 3}
+
+
+def test_server_errors_are_retried():
+    attempts = Counter()
+
+    def handler(request):
+        attempts[request.url.path] += 1
+        if attempts[request.url.path] <= 2:
+            return httpx.Response(503)
+        return httpx.Response(200, content=b"%PDF")
+
+    assert fetch_all(handler, ["http://a.test/flaky"], retries=2) == [b"%PDF"]
+    assert attempts["/flaky"] == 3
+
+
+def test_retries_give_up_after_the_limit():
+    attempts = Counter()
+
+    def handler(request):
+        attempts[request.url.path] += 1
+        return httpx.Response(502)
+
+    with pytest.raises(DownloadError):
+        fetch_all(handler, ["http://a.test/down"], retries=2)
+    assert attempts["/down"] == 3
+
+
+def test_client_errors_are_not_retried():
+    attempts = Counter()
+
+    def handler(request):
+        attempts[request.url.path] += 1
+        return httpx.Response(404)
+
+    with pytest.raises(DownloadError) as error:
+        fetch_all(handler, ["http://a.test/missing"], retries=2)
+    assert not isinstance(error.value, DownloadTooLarge)
+    assert attempts["/missing"] == 1
+
+
+def test_declared_length_over_the_cap_is_too_large():
+    def handler(request):
+        return httpx.Response(200, content=b"x" * 101)
+
+    with pytest.raises(DownloadTooLarge):
+        fetch_all(handler, ["http://a.test/big"], max_bytes=100)
+
+
+def test_streamed_body_over_the_cap_is_too_large():
+    chunks_sent = defaultdict(int)
+
+    async def body():
+        for _ in range(100):
+            chunks_sent["big"] += 1
+            yield b"x" * 10
+
+    def handler(request):
+        # No Content-Length, so the limit is enforced while reading
+        return httpx.Response(200, content=body())
+
+    with pytest.raises(DownloadTooLarge):
+        fetch_all(handler, ["http://a.test/big"], max_bytes=100)
+    assert chunks_sent["big"] < 100
+
+
+def test_bodies_come_back_in_request_order():
+    async def handler(request):
+        index = int(request.url.path.strip("/"))
+        # Later URLs finish first
+        await asyncio.sleep(0.002 * (10 - index))
+        return httpx.Response(200, content=str(index).encode())
+
+    urls = [f"http://a.test/{i}" for i in range(10)]
+    assert fetch_all(handler, urls) == [str(i).encode() for i in range(10)]
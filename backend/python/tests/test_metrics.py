@@ -0,0 +1,58 @@
+import asyncio
+
+from metrics import REGISTRY, DOCUMENTS_PROCESSED, ENCODE_BATCH_SIZE, endpoint
+from workers import WorkerPool
+
+
+def record(documents, batch):
+    DOCUMENTS_PROCESSED.inc(documents)
+    ENCODE_BATCH_SIZE.observe(batch)
+    return documents
+
+
+def record_and_fail(documents):
+    DOCUMENTS_PROCESSED.inc(documents)
+    raise ValueError("failed after recording")
+
+
+def recorded(label):
+    return sum(value for _, key, _, value in DOCUMENTS_PROCESSED.samples() if key == (label,))
+
+
+def run_in_pool(label, *calls):
+    async def run():
+        pool = WorkerPool(kind="process", workers=2)
+        endpoint.set(label)
+        try:
+            return await asyncio.gather(*(pool.run(*call) for call in calls), return_exceptions=True)
+        finally:
+            pool.shutdown()
+
+    return asyncio.run(run())
+
+
+def test_process_workers_send_their_metrics_back():
+    REGISTRY.drain()
+    assert run_in_pool("/test", (record, 3, 8), (record, 4, 16)) == [3, 4]
+    assert recorded("/test") == 7
+    sizes = {name: value for name, key, _, value in ENCODE_BATCH_SIZE.samples() if key == ("/test",)}
+    assert sizes["smartcheck_encode_batch_size_count"] == 2
+    assert sizes["smartcheck_encode_batch_size_sum"] == 24
+
+
+def test_metrics_of_a_failed_call_are_kept():
+    REGISTRY.drain()
+    [error] = run_in_pool("/failing", (record_and_fail, 5))
+    assert isinstance(error, ValueError)
+    assert recorded("/failing") == 5
+
+
+def test_drained_values_merge_back_unchanged():
+    REGISTRY.drain()
+    DOCUMENTS_PROCESSED.inc(2, endpoint="/merge")
+    ENCODE_BATCH_SIZE.observe(3, endpoint="/merge")
+    before = REGISTRY.render()
+    drained = REGISTRY.drain()
+    assert "/merge" not in REGISTRY.render()
+    REGISTRY.merge(drained)
+    assert REGISTRY.render() == before
@@ -0,0 +1,36 @@
+import string
+
+from passages import Document, PassageMatcher
+
+
+def words(prefix, count):
+    # Letters only: digits are stripped when text is normalized
+    return " ".join(prefix + string.ascii_lowercase[i // 26] + string.ascii_lowercase[i % 26] for i in range(count))
+
+
+PASSAGE = words("copied", 60)
+
+
+def script(name):
+    own = words(name, 40)
+    return Document([f"{own} {PASSAGE} {own}"])
+
+
+def test_passage_shared_by_three_documents_matches_every_pair():
+    documents = [script(name) for name in ("alpha", "beta", "gamma")]
+    results = PassageMatcher().match(documents)
+    assert [(r["file1_index"], r["file2_index"]) for r in results] == [(0, 1), (0, 2), (1, 2)]
+    assert all(r["matched_words"] >= 55 for r in results)
+
+
+def test_passage_in_most_of_a_large_cohort_is_boilerplate():
+    documents = [script(f"student{string.ascii_lowercase[i]}") for i in range(12)]
+    assert PassageMatcher().match(documents) == []
+
+
+def test_words_are_normalized_like_document_scores():
+    document = Document(["The Cat's 2 hats,\nand-so on", "x1y"])
+    assert document.words == ["cats", "hats", "andso", "on", "xy"]
+    assert [document.text[s:e] for s, e in zip(document.starts, document.ends)] == \
+        ["Cat's", "hats,", "and-so", "on", "x1y"]
+    assert document.page_of(int(document.starts[-1])) == 2
@@ -0,0 +1,83 @@
+import cProfile
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import profiling
+import server
+from workers import WorkerPool
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "_store", profiling.ProfileStore(root=str(tmp_path)))
+    pool = WorkerPool(kind="thread", workers=2)
+    app = FastAPI()
+    # The middleware the server registers when PROFILING=1
+    app.middleware("http")(server.profile_request)
+
+    @app.get("/work")
+    async def work():
+        return {"results": [await pool.run(busy, 10000) for _ in range(3)]}
+
+    yield TestClient(app)
+    pool.shutdown()
+
+
+class SingleProfiler(cProfile.Profile):
+    """A profiler that, as on Python 3.12+, refuses to run alongside another"""
+
+    active = None
+
+    def enable(self, *args, **kwargs):
+        if SingleProfiler.active not in (None, self):
+            raise ValueError("Another profiling tool is already active")
+        SingleProfiler.active = self
+        super().enable(*args, **kwargs)
+
+    def disable(self):
+        if SingleProfiler.active is self:
+            SingleProfiler.active = None
+        super().disable()
+
+
+def profile_of(client):
+    response = client.get("/work?profile=1")
+    assert response.status_code == 200
+    assert response.json() == {"results": [busy(10000)] * 3}
+    return profiling.get_profile_store().load(response.headers["X-Profile-Id"])
+
+
+def test_profiled_request_profiles_offloaded_calls(client):
+    summary = profile_of(client)
+    assert summary["status"] == 200
+    assert summary["event_loop_profiled"]
+    assert summary["worker_calls_profiled"] == 3
+    assert any("busy" in row["function"] for row in summary["top"])
+
+
+def test_offloaded_calls_run_when_another_profiler_is_active(client, monkeypatch):
+    monkeypatch.setattr(profiling.cProfile, "Profile", SingleProfiler)
+    summary = profile_of(client)
+    assert summary["event_loop_profiled"]
+    assert summary["worker_calls_profiled"] == 0
+    assert summary["worker_calls_unprofiled"] == 3
+    assert SingleProfiler.active is None
+
+
+def test_loop_profiler_is_skipped_when_another_profiler_is_active(client, monkeypatch):
+    monkeypatch.setattr(profiling.cProfile, "Profile", SingleProfiler)
+    other = SingleProfiler()
+    other.enable()
+    try:
+        summary = profile_of(client)
+    finally:
+        other.disable()
+    assert not summary["event_loop_profiled"]
+    assert summary["worker_calls_unprofiled"] == 3
+    assert not profiling._loop_profiling.locked()
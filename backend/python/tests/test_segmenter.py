@@ -0,0 +1,49 @@
+import random
+import time
+
+import pytest
+
+from benchmarks.segmenter import legacy_segment, fuzz_script, synthetic_script
+from segmenter import segment
+
+# Long runs of markers, separators and whitespace with no question number
+PATHOLOGICAL = {
+    "blank lines": lambda n: "x" + " \n" * n + "y",
+    "bare Q lines": lambda n: "Q1\n" + "Q\n" * n,
+    "Q words": lambda n: "1. x\n" + "Q " * n,
+    "Question words": lambda n: "Q1 ans " + "Question " * n,
+    "answer markers": lambda n: "Q1 ans\n" + "answer " * n,
+    "escaped newlines": lambda n: "Q1 ans\n" + "#\n" * n,
+    "separators": lambda n: "Q1 ans" + ":- \n" * n,
+    "tabs and form feeds": lambda n: "[1] answer" + "\t\f\n" * n,
+}
+
+
+def test_random_scripts_segment_like_the_legacy_regexes():
+    rng = random.Random(0)
+    for _ in range(3000):
+        text = fuzz_script(rng)
+        assert segment(text) == legacy_segment(text), repr(text)
+
+
+@pytest.mark.parametrize("questions", [1, 10, 50])
+def test_well_formed_scripts_segment_like_the_legacy_regexes(questions):
+    text = synthetic_script(questions, answer_words=40, seed=questions)
+    answers = segment(text)
+    assert answers == legacy_segment(text)
+    assert len(answers) == questions
+
+
+@pytest.mark.parametrize("name", sorted(PATHOLOGICAL))
+def test_pathological_runs_segment_like_the_legacy_regexes(name):
+    text = PATHOLOGICAL[name](1000)
+    assert segment(text) == legacy_segment(text)
+
+
+@pytest.mark.parametrize("name", sorted(PATHOLOGICAL))
+def test_pathological_runs_segment_in_linear_time(name):
+    # The legacy block check is quadratic in a run of blank lines: minutes at this length
+    text = PATHOLOGICAL[name](100000)
+    start = time.perf_counter()
+    segment(text)
+    assert time.perf_counter() - start < 2.0
@@ -0,0 +1,115 @@
+import sys
+import asyncio
+import threading
+import traceback
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from profiling import profiled
+from metrics import REGISTRY, endpoint, run_recorded
+from config import WORKER_POOL_KIND, WORKER_POOL_SIZE, WORKER_QUEUE_DEPTH
+
+
+def run_initializer(initializer):
+    """Run a process worker's initializer, logging instead of raising.
+
+    An exception escaping a ProcessPoolExecutor initializer breaks the
+    whole pool, so every later task would fail with BrokenProcessPool; the
+    worker keeps serving and the failure resurfaces in the tasks that need
+    what the initializer set up (and so on /readyz).
+    """
+    # Metrics it records are sent back with the worker's first task
+    endpoint.set("worker_initializer")
+    try:
+        initializer()
+    except Exception:
+        print(f"Worker initializer failed:\n{traceback.format_exc()}", file=sys.stderr)
+
+
+class WorkerPool:
+    """Executor for CPU-bound stages so the event loop keeps serving requests.
+
+    ``kind`` selects a thread or process pool. At most ``queue_depth`` tasks
+    are submitted at once; further callers wait for a slot instead of
+    piling work onto the executor's unbounded queue. ``initializer`` runs
+    once in every process-pool worker as it starts, before it takes a task;
+    if it raises, the error is logged and the worker starts anyway.
+    """
+
+    def __init__(self, kind=WORKER_POOL_KIND, workers=WORKER_POOL_SIZE, queue_depth=WORKER_QUEUE_DEPTH,
+                 initializer=None):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown worker pool kind: {kind}")
+        self.kind = kind
+        self.workers = workers
+        self.queue_depth = queue_depth
+        if kind == "process":
+            self.executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=partial(run_initializer, initializer) if initializer else None
+            )
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cpu-worker")
+        self._slots = None
+
+    async def run(self, fn, *args, **kwargs):
+        """Run ``fn(*args, **kwargs)`` on the pool and await its result.
+
+        Thread workers run in a copy of the caller's context, so context
+        variables (such as the metrics endpoint label) carry over, and a
+        profiled request profiles its calls there too. Process workers send
+        back the metrics they record, labelled with the caller's endpoint.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.queue_depth)
+        call = partial(fn, *args, **kwargs)
+        if self.kind == "thread":
+            call = partial(contextvars.copy_context().run, profiled(call))
+        else:
+            call = partial(run_recorded, endpoint.get(), call)
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            if self.kind == "thread":
+                return await loop.run_in_executor(self.executor, call)
+            try:
+                result, recorded = await loop.run_in_executor(self.executor, call)
+            except BaseException as e:
+                REGISTRY.merge(getattr(e, "metric_deltas", {}))
+                raise
+        REGISTRY.merge(recorded)
+        return result
+
+    async def map(self, fn, items, on_done=None):
+        """Run ``fn`` over ``items`` in parallel, returning results in order.
+
+        ``on_done(item)`` is called as each item finishes.
+        """
+        async def run_one(item):
+            result = await self.run(fn, item)
+            if on_done is not None:
+                on_done(item)
+            return result
+
+        return await asyncio.gather(*(run_one(item) for item in items))
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_worker_pool(initializer=None):
+    """Return the process-wide pool; ``initializer`` only applies to the call that creates it"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = WorkerPool(initializer=initializer)
+    return _pool
+
+def shutdown_worker_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown()
+            _pool = None